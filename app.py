@@ -373,8 +373,11 @@ class AIMultimodalApp:
 
                 # frame = cv2.flip(frame, 1)
 
+                # 眼动追踪与头部姿态共用同一张灰度图
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
                 # 眼动追踪
-                gaze.refresh(frame)
+                gaze.refresh(frame, gray)
                 current_gaze_state = "center"
                 if gaze.is_right():
                     current_gaze_state = "right"
@@ -407,7 +410,7 @@ class AIMultimodalApp:
                         print(f"👁 眼动持续: {gaze_state['state']}, 时长: {gaze_state['duration']:.1f}秒")
 
                 # 头部姿态检测
-                head_pose_result = hp.process_frame(frame)
+                head_pose_result = hp.process_frame(frame, gray)
                 if head_pose_result:
                     if head_pose_result["type"] == "head_pose_calibrated":
                         print(f"🎯 头部姿态基线校准: pitch0={head_pose_result['pitch0']:.1f}°")
@@ -417,15 +420,15 @@ class AIMultimodalApp:
                 # 手势识别
                 rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 rgb.flags.writeable = False
-                res = gr.hands.process(rgb)
+                res = gr.process_hands(rgb)
                 rgb.flags.writeable = True
 
                 current_gesture = None
                 current_conf = 0.0
 
                 if res.multi_hand_landmarks:
-                    for hlm in res.multi_hand_landmarks:
-                        gesture, conf = gr._recognize_gesture(hlm)
+                    # 多只手一次批量分类，取第一个识别出的手势
+                    for gesture, conf in gr._recognize_gestures(res.multi_hand_landmarks):
                         if gesture:
                             current_gesture = gesture
                             current_conf = conf
@@ -471,7 +474,7 @@ class AIMultimodalApp:
         except Exception as e:
             print(f"❌ 视觉线程错误: {e}")
         finally:
-            gr.hands.close()
+            # Hands 实例按摄像头在进程内共享（见 _shared_hands），此处不关闭
             print("👁 视觉线程结束")
 
     def print_status(self):
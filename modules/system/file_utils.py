@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+配置文件读写工具
+
+提供崩溃安全的原子写入，供用户配置和权限配置共用
+"""
+
+import os
+import stat
+import tempfile
+
+
+# 进程的 umask 只能通过设置后恢复的方式读取，在导入时读取一次
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write_bytes(path: str, payload: bytes):
+    """原子写入文件：先写入并同步临时文件，再替换目标文件并同步目录项"""
+    directory = os.path.dirname(path) or "."
+
+    # 临时文件名唯一，并发保存互不冲突，崩溃残留的临时文件也不会妨碍之后的保存
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            # mkstemp 创建的文件权限为 0600：沿用原文件的权限，新文件按 umask 取默认权限
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.chmod(tmp_path, mode)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # 同步目录，确保替换后的目录项落盘（不支持 O_DIRECTORY 的平台跳过）
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
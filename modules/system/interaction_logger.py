@@ -5,18 +5,50 @@
 记录和分析多模态交互日志，帮助优化用户体验
 """
 
+import atexit
 import json
 import os
+import queue
 import sqlite3
+import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import threading
 from collections import defaultdict
 
 
+# 交互日志表结构（旧版单表与月度分区表共用）
+INTERACTION_LOG_COLUMNS = """
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    user_id TEXT,
+    session_id TEXT,
+    interaction_type TEXT NOT NULL,
+    modality TEXT NOT NULL,
+    input_data TEXT,
+    ai_response TEXT,
+    confidence REAL,
+    processing_time REAL,
+    success BOOLEAN,
+    error_message TEXT,
+    context_data TEXT
+"""
+
+
 class InteractionLogger:
     """多模态交互日志记录器"""
-    
+
+    # 导出日志时每批读取的行数
+    EXPORT_BATCH_SIZE = 1000
+    # 只读连接的预编译语句缓存大小（sqlite3 默认为128）
+    CACHED_STATEMENTS = 256
+    # 后台写入队列容量，队列满时丢弃最旧的非重要记录（重要记录从不丢弃）
+    WRITE_QUEUE_SIZE = 10000
+    # flush 等待队列写完的最长秒数
+    FLUSH_TIMEOUT = 5.0
+    # 后台线程每批最多写入的记录数（同一批在一个事务中提交）
+    WRITE_BATCH_SIZE = 64
+
     def __init__(self, log_dir: str = "data/logs"):
         self.log_dir = log_dir
         self.db_path = os.path.join(log_dir, "interactions.db")
@@ -27,7 +59,15 @@ class InteractionLogger:
         
         self.lock = threading.Lock()
         self.db_available = False  # 数据库可用标志
+        self._partitions = set()  # 已存在的月度分区表
+        self._local = threading.local()  # 每个线程持有的只读连接
         
+        # 后台写入队列，元素为 (写入函数, 参数, 是否重要)；容量由 _enqueue 控制，
+        # 防止突发流量耗尽内存，重要记录可在队列满时超出容量
+        self._write_queue = queue.Queue()
+        self._dropped = 0  # 因队列满被丢弃的记录数
+        self._dropped_lock = threading.Lock()
+
         # 确保日志目录存在
         os.makedirs(log_dir, exist_ok=True)
         
@@ -44,6 +84,109 @@ class InteractionLogger:
             print(f"❌ 交互日志记录器初始化失败: {e}")
             print("⚠️ 将在无数据库模式下运行，但可视化日志仍可用")
             self.db_available = False
+        
+        # 启动后台写入线程，退出前写完队列中的记录
+        self._writer_thread = threading.Thread(target=self._writer_loop,
+                                               name="InteractionLogWriter", daemon=True)
+        self._writer_thread.start()
+        atexit.register(self.flush)
+    
+    def _enqueue(self, func, args: tuple, critical: bool = False):
+        """将写入任务放入后台队列（从不阻塞调用方）
+
+        队列满时淘汰最旧的非重要记录；重要记录（如失败的交互）从不被淘汰，
+        队列中只剩重要记录时，新的重要记录超出容量入队，新的普通记录被丢弃。
+        """
+        write_queue = self._write_queue
+        accepted, dropped = True, False
+        with write_queue.mutex:
+            pending = write_queue.queue
+            if len(pending) >= self.WRITE_QUEUE_SIZE:
+                victim = next((i for i, (_, _, is_critical) in enumerate(pending) if not is_critical), None)
+                if victim is not None:
+                    del pending[victim]
+                    write_queue.unfinished_tasks -= 1
+                    dropped = True
+                else:
+                    accepted, dropped = critical, not critical
+            
+            if accepted:
+                pending.append((func, args, critical))
+                write_queue.unfinished_tasks += 1
+                write_queue.not_empty.notify()
+        
+        if dropped:
+            self._record_dropped()
+    
+    def _record_dropped(self):
+        """累计被丢弃的记录数"""
+        with self._dropped_lock:
+            self._dropped += 1
+            dropped = self._dropped
+        if dropped % 1000 == 1:
+            print(f"⚠️ 日志写入队列已满，累计丢弃 {dropped} 条记录")
+    
+    def _writer_loop(self):
+        """后台写入线程：取出队列中已积压的记录，按批写入"""
+        while True:
+            batch = [self._write_queue.get()]
+            while len(batch) < self.WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"❌ 后台写入日志失败: {e}")
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+    
+    def _write_batch(self, batch: List[tuple]):
+        """写入一批记录：可视化日志只重写一次，数据库只提交一次"""
+        log_entries = [args[0] for func, args, _ in batch if func == self._write_interaction]
+        if log_entries:
+            self._append_to_readable_log(log_entries)
+        
+        if not self.db_available:
+            if log_entries:
+                print("⚠️ 数据库不可用，但已记录到可视化日志文件")
+            return
+        
+        with self.lock:
+            with sqlite3.connect(self.db_path, timeout=5.0) as conn:
+                # 交互记录合并为 executemany 批量插入，其余记录逐条写入
+                interactions = []
+                for func, args, _ in batch:
+                    if func == self._write_interaction:
+                        interactions.append(args)
+                    else:
+                        func(conn, *args)
+                if interactions:
+                    self._write_interactions(conn, interactions)
+                conn.commit()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待队列中所有待写入的记录落盘，超时（默认 FLUSH_TIMEOUT 秒）返回 False"""
+        deadline = time.monotonic() + (self.FLUSH_TIMEOUT if timeout is None else timeout)
+        write_queue = self._write_queue
+        with write_queue.all_tasks_done:
+            while write_queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                write_queue.all_tasks_done.wait(remaining)
+        return True
+    
+    def get_writer_stats(self) -> Dict[str, int]:
+        """获取后台写入队列状态"""
+        return {
+            "queued": self._write_queue.qsize(),
+            "dropped": self._dropped,
+            "capacity": self.WRITE_QUEUE_SIZE
+        }
     
     def _init_readable_logs(self):
         """初始化可视化日志文件"""
@@ -56,8 +199,8 @@ class InteractionLogger:
         except Exception as e:
             print(f"⚠️ 初始化可视化日志失败: {e}")
     
-    def _append_to_readable_log(self, log_entry: Dict[str, Any]):
-        """添加条目到可视化日志文件"""
+    def _append_to_readable_log(self, log_entries: List[Dict[str, Any]]):
+        """添加一批条目到可视化日志文件"""
         try:
             # 读取现有日志
             daily_logs = []
@@ -69,7 +212,7 @@ class InteractionLogger:
                     daily_logs = []
             
             # 添加新条目
-            daily_logs.append(log_entry)
+            daily_logs.extend(log_entries)
             
             # 写回文件
             with open(self.daily_log_path, 'w', encoding='utf-8') as f:
@@ -95,33 +238,31 @@ class InteractionLogger:
             conn = sqlite3.connect(self.db_path, timeout=1.0)
             
             print("📊 设置数据库参数...")
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")  # 新建数据库时启用增量回收（已有数据库在 cleanup_old_logs 中切换）
             conn.execute("PRAGMA journal_mode=WAL")  # 使用WAL模式避免锁定
             conn.execute("PRAGMA synchronous=NORMAL")  # 提高性能
             conn.execute("PRAGMA temp_store=memory")  # 使用内存临时存储
             conn.execute("PRAGMA busy_timeout=1000")  # 设置忙等待超时为1秒
-            
+
             cursor = conn.cursor()
-            
+
             print("📊 创建交互日志表...")
-            # 创建交互日志表
-            cursor.execute("""
+            # 创建交互日志表（旧版单表，保留用于兼容历史数据）
+            cursor.execute(f"""
                 CREATE TABLE IF NOT EXISTS interaction_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    user_id TEXT,
-                    session_id TEXT,
-                    interaction_type TEXT NOT NULL,
-                    modality TEXT NOT NULL,
-                    input_data TEXT,
-                    ai_response TEXT,
-                    confidence REAL,
-                    processing_time REAL,
-                    success BOOLEAN,
-                    error_message TEXT,
-                    context_data TEXT
+                    {INTERACTION_LOG_COLUMNS}
                 )
             """)
-            
+
+            # 加载已有的月度分区表并重建汇总视图
+            cursor.execute("""
+                SELECT name FROM sqlite_master
+                WHERE type = 'table' AND name GLOB 'interaction_logs_[0-9]*'
+            """)
+            self._partitions = {row[0] for row in cursor.fetchall()}
+            self._ensure_partition(conn, self._partition_table(datetime.now().isoformat()))
+            self._rebuild_partition_view(conn)
+
             print("📊 创建性能统计表...")
             # 创建性能统计表
             cursor.execute("""
@@ -182,7 +323,39 @@ class InteractionLogger:
         except Exception as e:
             print(f"❌ 数据库初始化错误: {e}")
             raise e
-    
+
+    def _reader_connection(self) -> sqlite3.Connection:
+        """获取当前线程的持久只读连接，分析查询的SQL只需编译一次"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0,
+                                   cached_statements=self.CACHED_STATEMENTS)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _partition_table(timestamp: str) -> str:
+        """根据ISO时间戳获取对应的月度分区表名，如 interaction_logs_202411"""
+        return f"interaction_logs_{timestamp[:4]}{timestamp[5:7]}"
+
+    def _ensure_partition(self, conn: sqlite3.Connection, table: str):
+        """按需创建月度分区表及索引，并刷新汇总视图"""
+        if table in self._partitions:
+            return
+
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({INTERACTION_LOG_COLUMNS})")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp ON {table}(timestamp)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table}(user_id, timestamp)")
+        self._partitions.add(table)
+        self._rebuild_partition_view(conn)
+
+    def _rebuild_partition_view(self, conn: sqlite3.Connection):
+        """重建 interaction_logs_all 视图，汇总旧版单表与所有月度分区"""
+        tables = ["interaction_logs"] + sorted(self._partitions)
+        union_sql = " UNION ALL ".join(f"SELECT * FROM {table}" for table in tables)
+        conn.execute("DROP VIEW IF EXISTS interaction_logs_all")
+        conn.execute(f"CREATE VIEW interaction_logs_all AS {union_sql}")
+
     def log_interaction(self, 
                        interaction_type: str,
                        modality: str,
@@ -193,8 +366,9 @@ class InteractionLogger:
                        processing_time: Optional[float] = None,
                        success: bool = True,
                        error_message: Optional[str] = None,
-                       context_data: Optional[Dict[str, Any]] = None):
-        """记录交互日志"""
+                       context_data: Optional[Dict[str, Any]] = None,
+                       metrics: Optional[Dict[str, float]] = None):
+        """记录交互日志（metrics 中的性能指标与交互记录一起写入）"""
         
         # 计算置信度
         confidence = None
@@ -217,44 +391,89 @@ class InteractionLogger:
             "context_data": context_data
         }
         
-        # 记录到可视化日志文件
-        self._append_to_readable_log(log_entry)
+        # 交给后台写入线程处理，失败的交互记录不参与丢弃
+        self._enqueue(self._write_interaction, (log_entry, metrics), critical=not success)
+    
+    _INTERACTION_INSERT = """
+                INSERT INTO {table}
+                (timestamp, user_id, session_id, interaction_type, modality, 
+                 input_data, ai_response, confidence, processing_time, 
+                 success, error_message, context_data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """
+    
+    @staticmethod
+    def _interaction_row(log_entry: Dict[str, Any]) -> tuple:
+        """交互日志条目转换为插入参数"""
+        return (
+            log_entry["timestamp"],
+            log_entry["user_id"],
+            log_entry["session_id"],
+            log_entry["interaction_type"],
+            log_entry["modality"],
+            json.dumps(log_entry["input_data"], ensure_ascii=False),
+            json.dumps(log_entry["ai_response"], ensure_ascii=False) if log_entry["ai_response"] else None,
+            log_entry["confidence"],
+            log_entry["processing_time"],
+            log_entry["success"],
+            log_entry["error_message"],
+            json.dumps(log_entry["context_data"], ensure_ascii=False) if log_entry["context_data"] else None
+        )
+    
+    def _write_interaction(self, conn: sqlite3.Connection, log_entry: Dict[str, Any],
+                           metrics: Optional[Dict[str, float]] = None):
+        """写入交互日志到数据库（在后台写入线程中执行，由 _write_batch 统一提交）"""
+        self._write_interactions(conn, [(log_entry, metrics)])
+    
+    def _write_interactions(self, conn: sqlite3.Connection, items: List[tuple]):
+        """批量写入交互日志及其性能指标：按月分区表分组后各执行一次 executemany"""
+        rows_by_table: Dict[str, List[tuple]] = {}
+        metric_rows = []
+        for log_entry, metrics in items:
+            try:
+                table = self._partition_table(log_entry["timestamp"])
+                rows_by_table.setdefault(table, []).append(self._interaction_row(log_entry))
+            except Exception as e:
+                print(f"❌ 记录交互日志到数据库失败: {e}，但已记录到可视化日志文件")
+            
+            if metrics:
+                for metric_name, metric_value in metrics.items():
+                    metric_rows.append((log_entry["timestamp"], metric_name, metric_value,
+                                        log_entry["session_id"], log_entry["user_id"]))
         
-        # 如果数据库可用，也记录到数据库
-        if not self.db_available:
-            print("⚠️ 数据库不可用，但已记录到可视化日志文件")
-            return
+        for table, rows in rows_by_table.items():
+            try:
+                # 按月写入分区表
+                self._ensure_partition(conn, table)
+                self._insert_many(conn, self._INTERACTION_INSERT.format(table=table), rows,
+                                  "❌ 记录交互日志到数据库失败: {}，但已记录到可视化日志文件")
+            except Exception as e:
+                print(f"❌ 记录交互日志到数据库失败: {e}，但已记录到可视化日志文件")
         
+        if metric_rows:
+            try:
+                self._insert_many(conn, self._METRIC_INSERT, metric_rows, "❌ 记录性能指标失败: {}")
+            except Exception as e:
+                print(f"❌ 记录性能指标失败: {e}")
+    
+    @staticmethod
+    def _insert_many(conn: sqlite3.Connection, sql: str, rows: List[tuple], error_message: str):
+        """executemany 批量插入；某一行失败时回滚这一组并逐行重试，只丢弃出错的行"""
+        if not conn.in_transaction:
+            conn.execute("BEGIN")  # 保证保存点嵌套在本批事务中，释放时不会提前提交
+        conn.execute("SAVEPOINT insert_many")
         try:
-            with self.lock:
-                with sqlite3.connect(self.db_path, timeout=5.0) as conn:
-                    cursor = conn.cursor()
-                    
-                    cursor.execute("""
-                        INSERT INTO interaction_logs 
-                        (timestamp, user_id, session_id, interaction_type, modality, 
-                         input_data, ai_response, confidence, processing_time, 
-                         success, error_message, context_data)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        log_entry["timestamp"],
-                        user_id,
-                        session_id,
-                        interaction_type,
-                        modality,
-                        json.dumps(input_data, ensure_ascii=False),
-                        json.dumps(ai_response, ensure_ascii=False) if ai_response else None,
-                        confidence,
-                        processing_time,
-                        success,
-                        error_message,
-                        json.dumps(context_data, ensure_ascii=False) if context_data else None
-                    ))
-                    
-                    conn.commit()
-                    
-        except Exception as e:
-            print(f"❌ 记录交互日志到数据库失败: {e}，但已记录到可视化日志文件")
+            conn.executemany(sql, rows)
+        except Exception:
+            # executemany 中出错行之前的行已写入，先回滚再逐行插入，避免重复
+            conn.execute("ROLLBACK TO insert_many")
+            for row in rows:
+                try:
+                    conn.execute(sql, row)
+                except Exception as e:
+                    print(error_message.format(e))
+        finally:
+            conn.execute("RELEASE insert_many")
     
     def log_performance_metric(self, 
                               metric_name: str, 
@@ -265,25 +484,29 @@ class InteractionLogger:
         if not self.db_available:
             print("⚠️ 数据库不可用，跳过性能指标记录")
             return
-            
+        
+        self._enqueue(self._write_performance_metric,
+                      (datetime.now().isoformat(), metric_name, metric_value, session_id, user_id))
+    
+    _METRIC_INSERT = """
+                INSERT INTO performance_stats 
+                (timestamp, metric_name, metric_value, session_id, user_id)
+                VALUES (?, ?, ?, ?, ?)
+            """
+    
+    def _write_performance_metric(self, conn: sqlite3.Connection, timestamp: str, metric_name: str,
+                                  metric_value: float, session_id: Optional[str], user_id: Optional[str]):
+        """写入性能指标（在后台写入线程中执行，由 _write_batch 统一提交）"""
         try:
-            with self.lock:
-                with sqlite3.connect(self.db_path, timeout=5.0) as conn:
-                    cursor = conn.cursor()
-                    
-                    cursor.execute("""
-                        INSERT INTO performance_stats 
-                        (timestamp, metric_name, metric_value, session_id, user_id)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (
-                        datetime.now().isoformat(),
-                        metric_name,
-                        metric_value,
-                        session_id,
-                        user_id
-                    ))
-                    
-                    conn.commit()
+            cursor = conn.cursor()
+            
+            cursor.execute(self._METRIC_INSERT, (
+                timestamp,
+                metric_name,
+                metric_value,
+                session_id,
+                user_id
+            ))
                     
         except Exception as e:
             print(f"❌ 记录性能指标失败: {e}")
@@ -297,25 +520,27 @@ class InteractionLogger:
         if not self.db_available:
             print("⚠️ 数据库不可用，跳过用户行为记录")
             return
-            
+        
+        self._enqueue(self._write_user_behavior,
+                      (datetime.now().isoformat(), user_id, behavior_type, behavior_data, session_id))
+    
+    def _write_user_behavior(self, conn: sqlite3.Connection, timestamp: str, user_id: str,
+                             behavior_type: str, behavior_data: Dict[str, Any], session_id: Optional[str]):
+        """写入用户行为（在后台写入线程中执行，由 _write_batch 统一提交）"""
         try:
-            with self.lock:
-                with sqlite3.connect(self.db_path, timeout=5.0) as conn:
-                    cursor = conn.cursor()
-                    
-                    cursor.execute("""
-                        INSERT INTO user_behavior 
-                        (timestamp, user_id, behavior_type, behavior_data, session_id)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (
-                        datetime.now().isoformat(),
-                        user_id,
-                        behavior_type,
-                        json.dumps(behavior_data, ensure_ascii=False),
-                        session_id
-                    ))
-                    
-                    conn.commit()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO user_behavior 
+                (timestamp, user_id, behavior_type, behavior_data, session_id)
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                timestamp,
+                user_id,
+                behavior_type,
+                json.dumps(behavior_data, ensure_ascii=False),
+                session_id
+            ))
                     
         except Exception as e:
             print(f"❌ 记录用户行为失败: {e}")
@@ -340,8 +565,11 @@ class InteractionLogger:
         try:
             print(f"📊 开始获取交互统计信息 (用户: {user_id}, 天数: {days})...")
             
-            # 使用超时连接
-            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            # 先写完队列中的记录，保证统计包含最新数据
+            self.flush()
+            
+            # 复用当前线程的只读连接（预编译语句缓存随连接保留）
+            conn = self._reader_connection()
             cursor = conn.cursor()
             
             # 时间范围
@@ -358,14 +586,14 @@ class InteractionLogger:
             print("📊 查询总交互次数...")
             # 总交互次数
             cursor.execute(f"""
-                SELECT COUNT(*) FROM interaction_logs WHERE {where_clause}
+                SELECT COUNT(*) FROM interaction_logs_all WHERE {where_clause}
             """, params)
             total_interactions = cursor.fetchone()[0]
             
             print("📊 查询成功率...")
             # 成功率
             cursor.execute(f"""
-                SELECT COUNT(*) FROM interaction_logs 
+                SELECT COUNT(*) FROM interaction_logs_all 
                 WHERE {where_clause} AND success = 1
             """, params)
             successful_interactions = cursor.fetchone()[0]
@@ -375,7 +603,7 @@ class InteractionLogger:
             print("📊 查询模态分布...")
             # 模态分布
             cursor.execute(f"""
-                SELECT modality, COUNT(*) FROM interaction_logs 
+                SELECT modality, COUNT(*) FROM interaction_logs_all 
                 WHERE {where_clause}
                 GROUP BY modality
             """, params)
@@ -384,7 +612,7 @@ class InteractionLogger:
             print("📊 查询平均处理时间...")
             # 平均处理时间
             cursor.execute(f"""
-                SELECT AVG(processing_time) FROM interaction_logs 
+                SELECT AVG(processing_time) FROM interaction_logs_all 
                 WHERE {where_clause} AND processing_time IS NOT NULL
             """, params)
             avg_processing_time = cursor.fetchone()[0] or 0
@@ -392,7 +620,7 @@ class InteractionLogger:
             print("📊 查询置信度分布...")
             # 置信度分布
             cursor.execute(f"""
-                SELECT AVG(confidence) FROM interaction_logs 
+                SELECT AVG(confidence) FROM interaction_logs_all 
                 WHERE {where_clause} AND confidence IS NOT NULL
             """, params)
             avg_confidence = cursor.fetchone()[0] or 0
@@ -400,7 +628,7 @@ class InteractionLogger:
             print("📊 查询交互类型分布...")
             # 交互类型分布
             cursor.execute(f"""
-                SELECT interaction_type, COUNT(*) FROM interaction_logs 
+                SELECT interaction_type, COUNT(*) FROM interaction_logs_all 
                 WHERE {where_clause}
                 GROUP BY interaction_type
             """, params)
@@ -409,14 +637,14 @@ class InteractionLogger:
             print("📊 查询每日交互趋势...")
             # 每日交互趋势
             cursor.execute(f"""
-                SELECT DATE(timestamp) as date, COUNT(*) FROM interaction_logs 
+                SELECT DATE(timestamp) as date, COUNT(*) FROM interaction_logs_all 
                 WHERE {where_clause}
                 GROUP BY DATE(timestamp)
                 ORDER BY date
             """, params)
             daily_trend = dict(cursor.fetchall())
             
-            conn.close()
+            cursor.close()
             print("📊 交互统计信息获取完成")
             
             return {
@@ -456,8 +684,11 @@ class InteractionLogger:
         try:
             print(f"📊 开始获取用户行为分析 (用户: {user_id}, 天数: {days})...")
             
-            # 使用超时连接
-            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            # 先写完队列中的记录，保证统计包含最新数据
+            self.flush()
+            
+            # 复用当前线程的只读连接（预编译语句缓存随连接保留）
+            conn = self._reader_connection()
             cursor = conn.cursor()
             
             start_time = (datetime.now() - timedelta(days=days)).isoformat()
@@ -465,7 +696,7 @@ class InteractionLogger:
             print("📊 查询用户活跃度...")
             # 用户活跃度
             cursor.execute("""
-                SELECT DATE(timestamp) as date, COUNT(*) FROM interaction_logs 
+                SELECT DATE(timestamp) as date, COUNT(*) FROM interaction_logs_all 
                 WHERE user_id = ? AND timestamp >= ?
                 GROUP BY DATE(timestamp)
                 ORDER BY date
@@ -475,7 +706,7 @@ class InteractionLogger:
             print("📊 查询偏好的交互方式...")
             # 偏好的交互方式
             cursor.execute("""
-                SELECT modality, COUNT(*) as count FROM interaction_logs 
+                SELECT modality, COUNT(*) as count FROM interaction_logs_all 
                 WHERE user_id = ? AND timestamp >= ?
                 GROUP BY modality
                 ORDER BY count DESC
@@ -485,7 +716,7 @@ class InteractionLogger:
             print("📊 查询交互时间分布...")
             # 交互时间分布
             cursor.execute("""
-                SELECT strftime('%H', timestamp) as hour, COUNT(*) FROM interaction_logs 
+                SELECT strftime('%H', timestamp) as hour, COUNT(*) FROM interaction_logs_all 
                 WHERE user_id = ? AND timestamp >= ?
                 GROUP BY strftime('%H', timestamp)
                 ORDER BY hour
@@ -501,7 +732,7 @@ class InteractionLogger:
             """, (user_id, start_time))
             behavior_types = dict(cursor.fetchall())
             
-            conn.close()
+            cursor.close()
             print("📊 用户行为分析获取完成")
             
             return {
@@ -537,8 +768,11 @@ class InteractionLogger:
         try:
             print(f"📊 开始获取错误分析报告 (天数: {days})...")
             
-            # 使用超时连接
-            conn = sqlite3.connect(self.db_path, timeout=10.0)
+            # 先写完队列中的记录，保证统计包含最新数据
+            self.flush()
+            
+            # 复用当前线程的只读连接（预编译语句缓存随连接保留）
+            conn = self._reader_connection()
             cursor = conn.cursor()
             
             start_time = (datetime.now() - timedelta(days=days)).isoformat()
@@ -546,7 +780,7 @@ class InteractionLogger:
             print("📊 查询错误统计...")
             # 错误统计
             cursor.execute("""
-                SELECT error_message, COUNT(*) FROM interaction_logs 
+                SELECT error_message, COUNT(*) FROM interaction_logs_all 
                 WHERE timestamp >= ? AND success = 0 AND error_message IS NOT NULL
                 GROUP BY error_message
                 ORDER BY COUNT(*) DESC
@@ -556,7 +790,7 @@ class InteractionLogger:
             print("📊 查询错误趋势...")
             # 错误趋势
             cursor.execute("""
-                SELECT DATE(timestamp) as date, COUNT(*) FROM interaction_logs 
+                SELECT DATE(timestamp) as date, COUNT(*) FROM interaction_logs_all 
                 WHERE timestamp >= ? AND success = 0
                 GROUP BY DATE(timestamp)
                 ORDER BY date
@@ -569,7 +803,7 @@ class InteractionLogger:
                 SELECT modality, 
                        COUNT(*) as total,
                        SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) as errors
-                FROM interaction_logs 
+                FROM interaction_logs_all 
                 WHERE timestamp >= ?
                 GROUP BY modality
             """, (start_time,))
@@ -584,7 +818,7 @@ class InteractionLogger:
                     "error_rate": round(error_rate, 3)
                 }
             
-            conn.close()
+            cursor.close()
             print("📊 错误分析报告获取完成")
             
             return {
@@ -611,6 +845,7 @@ class InteractionLogger:
                    days: Optional[int] = None) -> bool:
         """导出日志数据"""
         try:
+            self.flush()
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
@@ -630,28 +865,41 @@ class InteractionLogger:
                 where_clause = " AND ".join(where_clauses) if where_clauses else "1=1"
                 
                 cursor.execute(f"""
-                    SELECT * FROM interaction_logs WHERE {where_clause}
+                    SELECT * FROM interaction_logs_all WHERE {where_clause}
                     ORDER BY timestamp DESC
                 """, params)
                 
-                logs = []
                 columns = [description[0] for description in cursor.description]
-                
-                for row in cursor.fetchall():
-                    log_entry = dict(zip(columns, row))
-                    # 解析JSON字段
-                    for field in ['input_data', 'ai_response', 'context_data']:
-                        if log_entry[field]:
-                            try:
-                                log_entry[field] = json.loads(log_entry[field])
-                            except json.JSONDecodeError:
-                                pass
-                    logs.append(log_entry)
-                
-                # 保存到文件
+
+                # 复用同一个编码器，避免每条记录都重新构造
+                encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+
+                # 分批读取，每批拼接后一次写入文件，避免一次性加载全部日志
                 with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(logs, f, ensure_ascii=False, indent=2)
-                
+                    f.write('[')
+                    first = True
+                    while True:
+                        rows = cursor.fetchmany(self.EXPORT_BATCH_SIZE)
+                        if not rows:
+                            break
+
+                        chunks = []
+                        for row in rows:
+                            log_entry = dict(zip(columns, row))
+                            # 解析JSON字段
+                            for field in ['input_data', 'ai_response', 'context_data']:
+                                if log_entry[field]:
+                                    try:
+                                        log_entry[field] = json.loads(log_entry[field])
+                                    except json.JSONDecodeError:
+                                        pass
+
+                            chunks.append(encoder.encode(log_entry))
+                        
+                        f.write(('\n' if first else ',\n') + ',\n'.join(chunks))
+                        first = False
+                    f.write('\n]' if not first else ']')
+
                 print(f"✅ 日志已导出到: {output_file}")
                 return True
                 
@@ -662,34 +910,65 @@ class InteractionLogger:
     def cleanup_old_logs(self, keep_days: int = 90):
         """清理旧日志（保留指定天数）"""
         try:
+            self.flush()
             with self.lock:
                 with sqlite3.connect(self.db_path) as conn:
                     cursor = conn.cursor()
                     
                     cutoff_time = (datetime.now() - timedelta(days=keep_days)).isoformat()
+                    cutoff_table = self._partition_table(cutoff_time)
+                    deleted_count = 0
                     
-                    # 删除旧的交互日志
-                    cursor.execute("""
-                        DELETE FROM interaction_logs WHERE timestamp < ?
-                    """, (cutoff_time,))
+                    # 整月过期的分区表直接删除，无需逐行扫描
+                    expired_tables = sorted(t for t in self._partitions if t < cutoff_table)
+                    for table in expired_tables:
+                        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+                        self._partitions.discard(table)
+                    if expired_tables:
+                        self._rebuild_partition_view(conn)
+                    
+                    # 截止月份的分区及旧版单表只删除过期记录
+                    for table in ["interaction_logs"] + ([cutoff_table] if cutoff_table in self._partitions else []):
+                        cursor.execute(f"""
+                            DELETE FROM {table} WHERE timestamp < ?
+                        """, (cutoff_time,))
+                        deleted_count += cursor.rowcount
                     
                     # 删除旧的性能统计
                     cursor.execute("""
                         DELETE FROM performance_stats WHERE timestamp < ?
                     """, (cutoff_time,))
+                    deleted_count += cursor.rowcount
                     
                     # 删除旧的用户行为记录
                     cursor.execute("""
                         DELETE FROM user_behavior WHERE timestamp < ?
                     """, (cutoff_time,))
+                    deleted_count += cursor.rowcount
                     
-                    deleted_count = cursor.rowcount
                     conn.commit()
                     
-                    print(f"🧹 已清理 {deleted_count} 条旧日志记录")
+                    self._reclaim_free_pages(conn)
+                    
+                    print(f"🧹 已清理 {deleted_count} 条旧日志记录，删除 {len(expired_tables)} 个过期分区表")
                     
         except Exception as e:
             print(f"❌ 清理旧日志失败: {e}")
+    
+    @staticmethod
+    def _reclaim_free_pages(conn: sqlite3.Connection):
+        """回收被删除记录占用的空闲页（失败时保持数据库当前模式，不影响日志记录）"""
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                # 该 PRAGMA 每步只释放一页，execute 只执行第一步，executescript 才会执行到结束
+                conn.executescript("PRAGMA incremental_vacuum;")
+            else:
+                # 启用增量回收前创建的数据库只能通过一次完整 VACUUM 切换模式
+                print("🧹 切换数据库为增量回收模式...")
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+        except sqlite3.Error as e:
+            print(f"⚠️ 回收日志数据库空闲页失败: {e}")
 
 
 # 全局交互日志记录器实例 - 使用延迟初始化
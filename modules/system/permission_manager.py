@@ -5,12 +5,21 @@
 实现系统权限管理，区分驾驶员与乘客的操作权限，确保安全
 """
 
+import copy
 import json
+import logging
 import os
-from typing import Dict, Any, List, Set, Optional
-from datetime import datetime
-from enum import Enum
+import queue
+import sys
+import time
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Set, Optional
+from datetime import date
+from enum import Enum, IntEnum
 import threading
+from collections import deque, namedtuple
+
+from .file_utils import atomic_write_bytes
 
 
 class UserRole(Enum):
@@ -20,8 +29,8 @@ class UserRole(Enum):
     ADMIN = "admin"
 
 
-class PermissionLevel(Enum):
-    """权限级别枚举"""
+class PermissionLevel(IntEnum):
+    """权限级别枚举（可直接与整数比较）"""
     NONE = 0
     READ = 1
     WRITE = 2
@@ -35,15 +44,102 @@ class SafetyContext(Enum):
     EMERGENCY = "emergency"    # 紧急状态
 
 
+logger = logging.getLogger(__name__)
+
+# 角色与安全上下文的序号，用于计算权限级别表的行号（键为驻留字符串）
+_ROLE_INDEX = {sys.intern(role.value): index for index, role in enumerate(UserRole)}
+_CONTEXT_INDEX = {sys.intern(context.value): index for index, context in enumerate(SafetyContext)}
+
+
+def _intern_keys(permissions: Dict[str, Any]) -> Dict[str, Any]:
+    """驻留权限配置中的资源、角色和上下文键，使字典查找可按身份比较"""
+    return {
+        sys.intern(resource): {
+            sys.intern(role): {sys.intern(context): level for context, level in contexts.items()}
+            for role, contexts in roles.items()
+        }
+        for resource, roles in permissions.items()
+    }
+
+# 权限快照：写者整体替换，读者无锁读取同一份一致的数据
+_PermissionSnapshot = namedtuple("_PermissionSnapshot", [
+    "safety_context",   # 当前安全上下文
+    "resource_index",   # 资源名 -> 资源序号
+    "resource_levels",  # 资源名 -> 该资源按行打包的权限级别
+    "masks",            # 每行各权限级别的资源位图
+    "allowed_cache"     # get_allowed_actions 结果缓存，随权限表一起重建
+])
+
+# 各安全上下文的限制信息（只读常量）
+_SAFETY_RESTRICTIONS = {
+    SafetyContext.DRIVING: MappingProxyType({
+        "current_context": SafetyContext.DRIVING.value,
+        "restricted_actions": (
+            "系统设置修改",
+            "复杂导航输入",
+            "文字输入",
+            "视频播放"
+        ),
+        "allowed_modalities": ("voice", "simple_gesture"),
+        "safety_notes": (
+            "行驶中优先保证驾驶安全",
+            "建议使用语音控制",
+            "复杂操作请在停车后进行"
+        )
+    }),
+    SafetyContext.EMERGENCY: MappingProxyType({
+        "current_context": SafetyContext.EMERGENCY.value,
+        "restricted_actions": (
+            "娱乐功能",
+            "非必要设置",
+            "游戏功能"
+        ),
+        "allowed_modalities": ("voice", "gesture"),
+        "safety_notes": (
+            "紧急状态，只允许必要操作",
+            "导航和通讯功能优先",
+            "其他功能暂时限制"
+        )
+    }),
+    SafetyContext.PARKED: MappingProxyType({
+        "current_context": SafetyContext.PARKED.value,
+        "restricted_actions": (),
+        "allowed_modalities": ("voice", "gesture", "touch", "gaze"),
+        "safety_notes": (
+            "停车状态，所有功能可用",
+            "可以进行系统设置和个性化配置"
+        )
+    })
+}
+
+# 操作校验使用的常量表
+_UNSAFE_DRIVING_ACTIONS = frozenset({"text_input", "video_play", "complex_navigation", "system_config"})
+_NON_ESSENTIAL_CATEGORIES = frozenset({"music", "games", "entertainment"})
+_PASSENGER_DRIVING_SUGGESTIONS = (
+    "请驾驶员代为操作",
+    "等待停车后再操作",
+    "使用语音助手询问信息"
+)
+_EMERGENCY_SUGGESTIONS = (
+    "使用导航功能",
+    "进行紧急通讯",
+    "查看车辆状态"
+)
+
+# 权限检查审计记录的字段顺序
+_CHECK_FIELDS = ("user_role", "resource", "required_level", "current_level", "safety_context", "result")
+
+
 class PermissionManager:
     """系统权限管理器"""
     
+    # 按天累计统计的保留天数
+    STATS_RETENTION_DAYS = 365
+    
     def __init__(self, config_file: str = "data/permissions.json"):
         self.config_file = config_file
-        self.lock = threading.Lock()
-        
-        # 当前安全上下文
-        self.current_safety_context = SafetyContext.PARKED
+        self.lock = threading.Lock()  # 串行化写者，读者通过快照无锁读取
+        self.history_lock = threading.Lock()  # 保护权限检查历史记录
         
         # 默认权限配置
         self.default_permissions = {
@@ -133,11 +229,21 @@ class PermissionManager:
             }
         }
         
-        # 加载权限配置
+        # 加载权限配置，并构建按资源特化的权限表快照（初始为停车状态）
         self.permissions = self._load_permissions()
+        self._snapshot = self._build_snapshot(self.permissions, SafetyContext.PARKED)
         
-        # 权限检查历史记录
-        self.permission_history = []
+        # 权限检查历史记录（环形缓冲，只保留最近1000条）
+        self.permission_history = deque(maxlen=1000)
+        
+        # 按天累计的权限检查统计，生成报告时无需扫描历史记录
+        self._daily_stats = deque(maxlen=self.STATS_RETENTION_DAYS)
+        
+        # 审计记录由后台线程写入历史，权限检查只需入队
+        self._audit_queue = queue.SimpleQueue()
+        self._audit_thread = threading.Thread(target=self._audit_worker,
+                                              name="PermissionAudit", daemon=True)
+        self._audit_thread.start()
         
         print("🔒 权限管理器初始化完成")
     
@@ -146,39 +252,40 @@ class PermissionManager:
         try:
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    return _intern_keys(json.load(f))
             else:
-                # 使用默认配置并保存
-                self._save_permissions(self.default_permissions)
-                return self.default_permissions.copy()
+                # 使用默认配置（与默认值相同时不落盘）
+                return copy.deepcopy(self.default_permissions)
         except Exception as e:
             print(f"❌ 加载权限配置失败: {e}")
-            return self.default_permissions.copy()
+            return copy.deepcopy(self.default_permissions)
     
     def _save_permissions(self, permissions: Dict[str, Any]):
-        """保存权限配置"""
+        """保存权限配置（原子写入，避免写入中断损坏配置）"""
         try:
+            # 尚无配置文件且内容为默认值时无需写入，加载时会回退到默认配置
+            if permissions == self.default_permissions and not os.path.exists(self.config_file):
+                return
+            
             os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(permissions, f, ensure_ascii=False, indent=2)
+            payload = json.dumps(permissions, ensure_ascii=False, indent=2).encode('utf-8')
+            atomic_write_bytes(self.config_file, payload)
         except Exception as e:
             print(f"❌ 保存权限配置失败: {e}")
     
     def set_safety_context(self, context: SafetyContext):
         """设置当前安全上下文"""
         with self.lock:
-            old_context = self.current_safety_context
-            self.current_safety_context = context
-            
-            print(f"🚗 安全上下文变更: {old_context.value} -> {context.value}")
-            
-            # 记录上下文变更
-            self.permission_history.append({
-                "timestamp": datetime.now().isoformat(),
-                "action": "context_change",
-                "old_context": old_context.value,
-                "new_context": context.value
-            })
+            old_context = self._snapshot.safety_context
+            self._snapshot = self._snapshot._replace(safety_context=context)
+        
+        print(f"🚗 安全上下文变更: {old_context.value} -> {context.value}")
+        
+        # 记录上下文变更
+        self._append_history("context_change", {
+            "old_context": old_context.value,
+            "new_context": context.value
+        })
     
     def check_permission(self, 
                         user_role: UserRole, 
@@ -186,48 +293,136 @@ class PermissionManager:
                         required_level: PermissionLevel) -> bool:
         """检查用户权限"""
         try:
-            with self.lock:
-                # 获取当前权限级别
-                current_level = self._get_permission_level(user_role, resource)
-                
-                # 权限检查结果
-                has_permission = current_level.value >= required_level.value
-                
-                # 记录权限检查
-                self.permission_history.append({
-                    "timestamp": datetime.now().isoformat(),
-                    "action": "permission_check",
-                    "user_role": user_role.value,
-                    "resource": resource,
-                    "required_level": required_level.value,
-                    "current_level": current_level.value,
-                    "safety_context": self.current_safety_context.value,
-                    "result": has_permission
-                })
-                
-                # 只保留最近1000条记录
-                if len(self.permission_history) > 1000:
-                    self.permission_history = self.permission_history[-1000:]
-                
-                if not has_permission:
-                    print(f"🚫 权限拒绝: {user_role.value} 用户无法执行 {resource} 操作 "
-                          f"(需要: {required_level.name}, 当前: {current_level.name})")
-                
-                return has_permission
+            # 获取当前权限级别（读取快照，无需加锁）
+            snapshot = self._snapshot
+            safety_context = snapshot.safety_context
+            current_level = self._get_permission_level(snapshot, user_role, resource)
+            
+            # 权限检查结果
+            has_permission = current_level >= required_level
+            
+            # 记录权限检查
+            self._audit_queue.put_nowait((time.time(), "permission_check", (
+                user_role.value, resource, required_level.value,
+                current_level, safety_context.value, has_permission
+            )))
+            
+            if not has_permission and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🚫 权限拒绝: %s 用户无法执行 %s 操作 (需要: %s, 当前: %s)",
+                             user_role.value, resource, required_level.name, PermissionLevel(current_level).name)
+            
+            return has_permission
                 
         except Exception as e:
-            print(f"❌ 权限检查失败: {e}")
+            logger.error("❌ 权限检查失败: %s", e)
             return False
     
-    def _get_permission_level(self, user_role: UserRole, resource: str) -> PermissionLevel:
-        """获取用户对资源的权限级别"""
-        try:
-            resource_permissions = self.permissions.get(resource, {})
-            role_permissions = resource_permissions.get(user_role.value, {})
-            level_value = role_permissions.get(self.current_safety_context.value, 0)
-            return PermissionLevel(level_value)
-        except (KeyError, ValueError):
-            return PermissionLevel.NONE
+    def _append_history(self, action: str, data: Dict[str, Any]):
+        """提交一条审计记录，由后台线程写入历史"""
+        self._audit_queue.put_nowait((time.time(), action, data))
+    
+    def _audit_worker(self):
+        """审计线程：组装记录并写入历史（超出容量时自动淘汰最旧的记录）"""
+        while True:
+            item = self._audit_queue.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            
+            timestamp, action, data = item
+            record = {"ts": timestamp, "action": action}  # 时间戳保留为浮点数，使用时再格式化
+            if action == "permission_check":
+                record.update(zip(_CHECK_FIELDS, data))
+            else:
+                record.update(data)
+            
+            with self.history_lock:
+                self.permission_history.append(record)
+                self._update_daily_stats(timestamp, action, data)
+    
+    def _update_daily_stats(self, timestamp: float, action: str, data):
+        """累加当天的统计计数（按本地日期分桶，调用方需持有 history_lock）"""
+        day = date.fromtimestamp(timestamp).toordinal()
+        if self._daily_stats and self._daily_stats[-1]["day"] == day:
+            bucket = self._daily_stats[-1]
+        else:
+            bucket = {"day": day, "resources": {}, "context_changes": 0}
+            self._daily_stats.append(bucket)
+        
+        if action == "permission_check":
+            resource = data[1]
+            counts = bucket["resources"].get(resource)
+            if counts is None:
+                counts = bucket["resources"][resource] = [0, 0]
+            counts[0] += 1
+            counts[1] += not data[5]
+        elif action == "context_change":
+            bucket["context_changes"] += 1
+    
+    def _flush_audit(self, timeout: float = 1.0):
+        """等待已提交的审计记录写入历史"""
+        done = threading.Event()
+        self._audit_queue.put_nowait(done)
+        done.wait(timeout)
+    
+    @staticmethod
+    def _build_snapshot(permissions: Dict[str, Any], safety_context: SafetyContext) -> _PermissionSnapshot:
+        """根据权限配置构建按资源特化的权限级别表和权限位图快照
+
+        每个资源对应一个 uint8 字节串，按 (角色, 安全上下文) 行号存放权限级别数值，
+        检查权限时只需一次字典查找和一次下标访问。权限位图按行存放，
+        第 level 个整数的第 i 位表示资源 i 的权限级别不低于 level。
+        """
+        resource_index = {resource: index for index, resource in enumerate(permissions)}
+        row_count = len(_ROLE_INDEX) * len(_CONTEXT_INDEX)
+        resource_levels = {}
+        masks = [[0] * len(PermissionLevel) for _ in range(row_count)]
+        
+        for resource, roles in permissions.items():
+            resource_i = resource_index[resource]
+            levels = bytearray(row_count)
+            for role_value, contexts in roles.items():
+                role_i = _ROLE_INDEX.get(role_value)
+                if role_i is None:
+                    continue
+                for context_value, level_value in contexts.items():
+                    context_i = _CONTEXT_INDEX.get(context_value)
+                    if context_i is None:
+                        continue
+                    try:
+                        level = PermissionLevel(level_value)
+                    except ValueError:
+                        level = PermissionLevel.NONE
+                    row = role_i * len(_CONTEXT_INDEX) + context_i
+                    levels[row] = level
+                    for granted in range(1, level + 1):
+                        masks[row][granted] |= 1 << resource_i
+            resource_levels[resource] = bytes(levels)
+        
+        return _PermissionSnapshot(
+            safety_context=safety_context,
+            resource_index=resource_index,
+            resource_levels=resource_levels,
+            masks=tuple(tuple(row_masks) for row_masks in masks),
+            allowed_cache={}
+        )
+    
+    @property
+    def current_safety_context(self) -> SafetyContext:
+        """当前安全上下文"""
+        return self._snapshot.safety_context
+    
+    @staticmethod
+    def _row(snapshot: _PermissionSnapshot, user_role: UserRole) -> int:
+        """获取 (角色, 快照中的安全上下文) 在权限表中的行号"""
+        return _ROLE_INDEX[user_role.value] * len(_CONTEXT_INDEX) + _CONTEXT_INDEX[snapshot.safety_context.value]
+    
+    def _get_permission_level(self, snapshot: _PermissionSnapshot, user_role: UserRole, resource: str) -> int:
+        """从快照中获取用户对资源的权限级别数值"""
+        levels = snapshot.resource_levels.get(resource)
+        if levels is None:
+            return PermissionLevel.NONE.value
+        return levels[self._row(snapshot, user_role)]
     
     def can_execute_command(self, user_role: UserRole, command_category: str) -> bool:
         """检查用户是否可以执行指定类别的命令"""
@@ -243,66 +438,27 @@ class PermissionManager:
     
     def get_allowed_actions(self, user_role: UserRole) -> Dict[str, List[str]]:
         """获取用户在当前安全上下文下允许的操作"""
-        allowed_actions = {
-            "read": [],
-            "write": [],
-            "admin": []
-        }
+        snapshot = self._snapshot
         
-        for resource in self.permissions.keys():
-            level = self._get_permission_level(user_role, resource)
-            
-            if level.value >= PermissionLevel.READ.value:
-                allowed_actions["read"].append(resource)
-            if level.value >= PermissionLevel.WRITE.value:
-                allowed_actions["write"].append(resource)
-            if level.value >= PermissionLevel.ADMIN.value:
-                allowed_actions["admin"].append(resource)
+        # 结果只取决于 (角色, 安全上下文)，缓存随权限表快照一起重建
+        key = (user_role.value, snapshot.safety_context.value)
+        allowed_actions = snapshot.allowed_cache.get(key)
+        if allowed_actions is None:
+            masks = snapshot.masks[self._row(snapshot, user_role)]
+            resources = list(snapshot.resource_index)
+            allowed_actions = snapshot.allowed_cache.setdefault(key, {
+                action: tuple(resource for resource_i, resource in enumerate(resources)
+                              if masks[level] >> resource_i & 1)
+                for action, level in (("read", PermissionLevel.READ),
+                                      ("write", PermissionLevel.WRITE),
+                                      ("admin", PermissionLevel.ADMIN))
+            })
         
-        return allowed_actions
+        return {action: list(resources) for action, resources in allowed_actions.items()}
     
-    def get_safety_restrictions(self) -> Dict[str, Any]:
-        """获取当前安全上下文的限制信息"""
-        restrictions = {
-            "current_context": self.current_safety_context.value,
-            "restricted_actions": [],
-            "allowed_modalities": [],
-            "safety_notes": []
-        }
-        
-        if self.current_safety_context == SafetyContext.DRIVING:
-            restrictions["restricted_actions"] = [
-                "系统设置修改",
-                "复杂导航输入",
-                "文字输入",
-                "视频播放"
-            ]
-            restrictions["allowed_modalities"] = ["voice", "simple_gesture"]
-            restrictions["safety_notes"] = [
-                "行驶中优先保证驾驶安全",
-                "建议使用语音控制",
-                "复杂操作请在停车后进行"
-            ]
-        elif self.current_safety_context == SafetyContext.EMERGENCY:
-            restrictions["restricted_actions"] = [
-                "娱乐功能",
-                "非必要设置",
-                "游戏功能"
-            ]
-            restrictions["allowed_modalities"] = ["voice", "gesture"]
-            restrictions["safety_notes"] = [
-                "紧急状态，只允许必要操作",
-                "导航和通讯功能优先",
-                "其他功能暂时限制"
-            ]
-        else:  # PARKED
-            restrictions["allowed_modalities"] = ["voice", "gesture", "touch", "gaze"]
-            restrictions["safety_notes"] = [
-                "停车状态，所有功能可用",
-                "可以进行系统设置和个性化配置"
-            ]
-        
-        return restrictions
+    def get_safety_restrictions(self) -> Mapping[str, Any]:
+        """获取当前安全上下文的限制信息（返回预先构建的只读映射）"""
+        return _SAFETY_RESTRICTIONS[self.current_safety_context]
     
     def update_permission(self, 
                          resource: str, 
@@ -311,86 +467,75 @@ class PermissionManager:
                          permission_level: PermissionLevel) -> bool:
         """更新权限配置（需要管理员权限）"""
         try:
+            resource = sys.intern(resource)
             with self.lock:
-                if resource not in self.permissions:
-                    self.permissions[resource] = {}
-                
-                if user_role.value not in self.permissions[resource]:
-                    self.permissions[resource][user_role.value] = {}
+                # 写时复制：在副本上修改后整体替换，读者始终看到完整的配置
+                permissions = copy.deepcopy(self.permissions)
+                permissions.setdefault(resource, {}).setdefault(user_role.value, {})[safety_context.value] = permission_level.value
                 
-                self.permissions[resource][user_role.value][safety_context.value] = permission_level.value
+                self.permissions = permissions
+                self._snapshot = self._build_snapshot(permissions, self._snapshot.safety_context)
                 
                 # 保存更新
-                self._save_permissions(self.permissions)
+                self._save_permissions(permissions)
                 
                 print(f"⚙️ 已更新权限: {resource}.{user_role.value}.{safety_context.value} = {permission_level.name}")
                 
-                # 记录权限修改
-                self.permission_history.append({
-                    "timestamp": datetime.now().isoformat(),
-                    "action": "permission_update",
-                    "resource": resource,
-                    "user_role": user_role.value,
-                    "safety_context": safety_context.value,
-                    "new_level": permission_level.value
-                })
-                
-                return True
+            # 记录权限修改
+            self._append_history("permission_update", {
+                "resource": resource,
+                "user_role": user_role.value,
+                "safety_context": safety_context.value,
+                "new_level": permission_level.value
+            })
+            
+            return True
                 
         except Exception as e:
             print(f"❌ 更新权限失败: {e}")
             return False
     
     def get_permission_report(self, days: int = 7) -> Dict[str, Any]:
-        """获取权限使用报告"""
+        """获取权限使用报告（按天累计统计，时间范围精确到天）"""
         try:
-            print(f"🔒 开始生成权限使用报告 (天数: {days})...")
-            
-            from datetime import timedelta
-            
-            cutoff_time = datetime.now() - timedelta(days=days)
-            print(f"🔒 筛选 {cutoff_time.isoformat()} 之后的权限记录...")
-            
-            recent_history = [
-                record for record in self.permission_history
-                if datetime.fromisoformat(record["timestamp"]) >= cutoff_time
-            ]
+            logger.debug("🔒 开始生成权限使用报告 (天数: %s)...", days)
             
-            print(f"🔒 找到 {len(recent_history)} 条最近的权限记录")
-            
-            # 统计权限检查次数
-            permission_checks = [r for r in recent_history if r["action"] == "permission_check"]
-            print(f"🔒 其中权限检查记录: {len(permission_checks)} 条")
-            
-            # 拒绝统计
-            denied_requests = [r for r in permission_checks if not r["result"]]
-            print(f"🔒 被拒绝的请求: {len(denied_requests)} 条")
-            
-            # 按资源分组的访问统计
+            # 汇总最近 days 个本地自然日（含当天）的按天统计
+            first_day = date.today().toordinal() - days + 1
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🔒 汇总 %s 起的权限统计...", date.fromordinal(first_day))
+            total_checks = 0
+            total_denied = 0
+            context_changes = 0
             resource_access = {}
-            for record in permission_checks:
-                resource = record["resource"]
-                if resource not in resource_access:
-                    resource_access[resource] = {"total": 0, "denied": 0}
-                resource_access[resource]["total"] += 1
-                if not record["result"]:
-                    resource_access[resource]["denied"] += 1
-            
-            print(f"🔒 资源访问统计: {len(resource_access)} 种资源")
             
-            # 安全上下文变更统计
-            context_changes = [r for r in recent_history if r["action"] == "context_change"]
-            print(f"🔒 安全上下文变更: {len(context_changes)} 次")
+            self._flush_audit()
+            with self.history_lock:
+                for bucket in self._daily_stats:
+                    if bucket["day"] < first_day:
+                        continue
+                    context_changes += bucket["context_changes"]
+                    for resource, (total, denied) in bucket["resources"].items():
+                        total_checks += total
+                        total_denied += denied
+                        
+                        # 按资源分组的访问统计
+                        stats = resource_access.get(resource)
+                        if stats is None:
+                            stats = resource_access[resource] = {"total": 0, "denied": 0}
+                        stats["total"] += total
+                        stats["denied"] += denied
             
-            print("🔒 权限使用报告生成完成")
+            logger.debug("🔒 权限检查记录: %s 条，被拒绝: %s 条，涉及资源: %s 种，安全上下文变更: %s 次",
+                         total_checks, total_denied, len(resource_access), context_changes)
             
             return {
                 "period_days": days,
-                "total_permission_checks": len(permission_checks),
-                "denied_requests": len(denied_requests),
-                "denial_rate": len(denied_requests) / len(permission_checks) if permission_checks else 0,
+                "total_permission_checks": total_checks,
+                "denied_requests": total_denied,
+                "denial_rate": total_denied / total_checks if total_checks else 0,
                 "resource_access_stats": resource_access,
-                "context_changes": len(context_changes),
+                "context_changes": context_changes,
                 "most_denied_resources": sorted(
                     [(k, v["denied"]) for k, v in resource_access.items()],
                     key=lambda x: x[1], reverse=True
@@ -398,25 +543,23 @@ class PermissionManager:
             }
             
         except Exception as e:
-            print(f"❌ 生成权限报告失败: {e}")
+            logger.error("❌ 生成权限报告失败: %s", e)
             return {}
     
     def reset_to_defaults(self) -> bool:
         """重置为默认权限配置"""
         try:
             with self.lock:
-                self.permissions = self.default_permissions.copy()
+                self.permissions = copy.deepcopy(self.default_permissions)
+                self._snapshot = self._build_snapshot(self.permissions, self._snapshot.safety_context)
                 self._save_permissions(self.permissions)
                 
                 print("🔄 权限配置已重置为默认值")
-                
-                # 记录重置操作
-                self.permission_history.append({
-                    "timestamp": datetime.now().isoformat(),
-                    "action": "reset_permissions"
-                })
-                
-                return True
+            
+            # 记录重置操作
+            self._append_history("reset_permissions", {})
+            
+            return True
                 
         except Exception as e:
             print(f"❌ 重置权限配置失败: {e}")
@@ -441,32 +584,22 @@ class PermissionManager:
                 
                 # 提供替代建议
                 if user_role == UserRole.PASSENGER and self.current_safety_context == SafetyContext.DRIVING:
-                    validation_result["alternative_suggestions"] = [
-                        "请驾驶员代为操作",
-                        "等待停车后再操作",
-                        "使用语音助手询问信息"
-                    ]
+                    validation_result["alternative_suggestions"] = list(_PASSENGER_DRIVING_SUGGESTIONS)
                 
                 return validation_result
             
             # 安全上下文检查
             if self.current_safety_context == SafetyContext.DRIVING:
-                unsafe_actions = ["text_input", "video_play", "complex_navigation", "system_config"]
-                if action_type in unsafe_actions:
+                if action_type in _UNSAFE_DRIVING_ACTIONS:
                     validation_result["reason"] = "行驶中不允许此类操作，确保驾驶安全"
                     validation_result["safety_warning"] = "请在停车后进行此操作"
                     return validation_result
             
             # 紧急状态检查
             if self.current_safety_context == SafetyContext.EMERGENCY:
-                non_essential_actions = ["music", "games", "entertainment"]
-                if category in non_essential_actions:
+                if category in _NON_ESSENTIAL_CATEGORIES:
                     validation_result["reason"] = "紧急状态下只允许必要操作"
-                    validation_result["alternative_suggestions"] = [
-                        "使用导航功能",
-                        "进行紧急通讯",
-                        "查看车辆状态"
-                    ]
+                    validation_result["alternative_suggestions"] = list(_EMERGENCY_SUGGESTIONS)
                     return validation_result
             
             # 通过所有检查
@@ -492,6 +625,10 @@ def get_permission_manager():
 # 为了保持向后兼容性，提供一个属性访问器
 class PermissionManagerProxy:
     def __getattr__(self, name):
-        return getattr(get_permission_manager(), name)
+        value = getattr(get_permission_manager(), name)
+        # 缓存已绑定的方法，之后的访问直接命中实例字典；数据属性可能被重新赋值，不做缓存
+        if callable(value):
+            object.__setattr__(self, name, value)
+        return value
 
 permission_manager = PermissionManagerProxy() 
\ No newline at end of file
@@ -5,39 +5,64 @@
 整合用户个性化配置和交互日志记录功能
 """
 
+import copy
+import logging
 import time
 from typing import Dict, Any, Optional
 from datetime import datetime
-import uuid
+from concurrent.futures import ThreadPoolExecutor
+import secrets
+import threading
 
 from .user_config import user_config_manager, UserConfigManager
 from .interaction_logger import interaction_logger, InteractionLogger
 
+log = logging.getLogger(__name__)
+
 
 class SystemManager:
     """系统管理器主类"""
     
+    __slots__ = ("user_config", "logger", "current_session_id", "session_start_time",
+                 "_dashboard_cache", "_command_categories", "_analytics_pool")
+    
+    # 控制面板用户数据的缓存有效期（秒）
+    DASHBOARD_CACHE_TTL = 1.0
+    # 系统分析报告的并发查询线程数
+    ANALYTICS_WORKERS = 4
+    
     def __init__(self):
         self.user_config = user_config_manager
         self.logger = interaction_logger
         
         # 当前会话信息
         self.current_session_id = None
-        self.session_start_time = None
+        self.session_start_time = None  # 单调时钟读数，仅用于计算会话时长
+        
+        # 控制面板用户数据缓存：(缓存键, 生成时间, 数据)
+        self._dashboard_cache = None
+        
+        # 常用指令类别缓存：(用户配置字典, 类别集合)，重新加载用户配置后自动失效
+        self._command_categories = None
+        
+        # 并发执行分析查询的线程池
+        self._analytics_pool = ThreadPoolExecutor(max_workers=self.ANALYTICS_WORKERS,
+                                                  thread_name_prefix="SystemAnalytics")
         
-        print("🎛️ 系统管理器初始化完成")
+        log.info("🎛️ 系统管理器初始化完成")
     
     def start_session(self, user_id: str = None) -> str:
         """开始新的用户会话"""
-        self.current_session_id = str(uuid.uuid4())
-        self.session_start_time = time.time()
+        self._dashboard_cache = None
+        self.current_session_id = secrets.token_hex(16)
+        self.session_start_time = time.monotonic()
         
         # 如果指定了用户ID，加载用户配置
         if user_id:
             if self.user_config.load_user(user_id):
                 # 获取用户角色
                 user_role = self.user_config.get_user_role()
-                print(f"📋 用户会话开始: {self.user_config.user_config['user_info']['name']} ({user_role})")
+                log.info("📋 用户会话开始: %s (%s)", self.user_config.user_config['user_info']['name'], user_role)
                 
                 # 记录会话开始
                 self.logger.log_user_behavior(
@@ -50,16 +75,17 @@ class SystemManager:
                     session_id=self.current_session_id
                 )
             else:
-                print(f"⚠️ 无法加载用户配置: {user_id}，使用默认设置")
+                log.warning("⚠️ 无法加载用户配置: %s，使用默认设置", user_id)
         else:
-            print("📋 匿名会话开始")
+            log.info("📋 匿名会话开始")
         
         return self.current_session_id
     
     def end_session(self):
         """结束当前会话"""
+        self._dashboard_cache = None
         if self.current_session_id:
-            session_duration = time.time() - self.session_start_time
+            session_duration = time.monotonic() - self.session_start_time
             
             # 记录会话结束
             if self.user_config.current_user:
@@ -73,7 +99,7 @@ class SystemManager:
                     session_id=self.current_session_id
                 )
             
-            print(f"📋 会话结束，持续时间: {session_duration:.1f}秒")
+            log.info("📋 会话结束，持续时间: %.1f秒", session_duration)
             
             self.current_session_id = None
             self.session_start_time = None
@@ -86,115 +112,133 @@ class SystemManager:
                                      error_message: Optional[str] = None) -> Dict[str, Any]:
         """处理多模态交互，记录交互日志"""
         
+        # 每次交互都会执行，先把频繁访问的属性绑定到局部变量
+        user_config = self.user_config
+        logger = self.logger
+        current_user = user_config.current_user
+        session_id = self.current_session_id
+        
         # 提取交互信息
         modality = interaction_data.get("modality", "unknown")
         interaction_type = interaction_data.get("type", "unknown")
         category = interaction_data.get("category", "system")
         
-        # 记录交互
-        self.logger.log_interaction(
+        # 记录交互，处理耗时作为性能指标随交互记录一起写入
+        logger.log_interaction(
             interaction_type=interaction_type,
             modality=modality,
             input_data=interaction_data,
             ai_response=ai_response,
-            user_id=self.user_config.current_user,
-            session_id=self.current_session_id,
+            user_id=current_user,
+            session_id=session_id,
             processing_time=processing_time,
             success=success,
-            error_message=error_message
+            error_message=error_message,
+            metrics={f"{modality}_processing_time": processing_time} if processing_time else None
         )
         
         # 更新用户交互模式
-        if self.user_config.current_user and success:
+        if current_user and success:
+            self._dashboard_cache = None
             if modality == "voice" and "text" in interaction_data:
-                self.user_config.update_interaction_pattern("voice", interaction_data["text"])
+                user_config.update_interaction_pattern("voice", interaction_data["text"])
                 # 添加到常用指令
-                if category in self.user_config.user_config.get("common_commands", {}):
-                    self.user_config.add_common_command(category, interaction_data["text"])
+                if category in self._get_command_categories(user_config.user_config):
+                    user_config.add_common_command(category, interaction_data["text"])
             
             elif modality == "gesture" and "gesture" in interaction_data:
-                self.user_config.update_interaction_pattern("gesture", interaction_data["gesture"])
-        
-        # 记录性能指标
-        if processing_time:
-            self.logger.log_performance_metric(
-                metric_name=f"{modality}_processing_time",
-                metric_value=processing_time,
-                user_id=self.user_config.current_user,
-                session_id=self.current_session_id
-            )
+                user_config.update_interaction_pattern("gesture", interaction_data["gesture"])
         
         return {
             "success": True,
             "message": "交互处理成功",
-            "session_id": self.current_session_id
+            "session_id": session_id
         }
     
+    def _get_command_categories(self, config: Dict[str, Any]) -> frozenset:
+        """获取用户配置中的常用指令类别（按配置字典缓存）"""
+        cached = self._command_categories
+        if cached is None or cached[0] is not config:
+            cached = (config, frozenset(config.get("common_commands", {})))
+            self._command_categories = cached
+        return cached[1]
+    
     def get_user_dashboard(self) -> Dict[str, Any]:
-        """获取用户控制面板信息"""
-        print("📊 开始构建用户控制面板...")
-        dashboard = {
-            "user_info": {},
-            "interaction_stats": {},
-            "common_commands": {},
-            "system_status": {}
-        }
+        """获取用户控制面板信息（用户数据短时缓存，系统状态每次重新计算）"""
+        log.debug("📊 开始构建用户控制面板...")
+        current_user = self.user_config.current_user
+        cache_key = (current_user, self.current_session_id)
         
-        # 用户信息
-        if self.user_config.current_user:
-            print("👤 获取用户信息...")
-            dashboard["user_info"] = {
-                "user_id": self.user_config.current_user,
-                "name": self.user_config.get_preference("user_info.name", "未知用户"),
-                "role": self.user_config.get_user_role(),
-                "last_login": self.user_config.get_preference("user_info.last_login", ""),
-                "interaction_preferences": self.user_config.get_preference("interaction_preferences", {})
+        cached = self._dashboard_cache
+        if cached and cached[0] == cache_key and time.monotonic() - cached[1] < self.DASHBOARD_CACHE_TTL:
+            log.debug("📊 使用缓存的用户数据")
+            user_sections = cached[2]
+        else:
+            user_sections = {
+                "user_info": {},
+                "interaction_stats": {},
+                "common_commands": {}
             }
-            print("✅ 用户信息获取完成")
             
-            # 获取用户常用指令
-            print("📝 获取用户常用指令...")
-            dashboard["common_commands"] = self.user_config.get_common_commands()
-            print("✅ 常用指令获取完成")
+            # 用户信息
+            if current_user:
+                log.debug("👤 获取用户信息...")
+                user_sections["user_info"] = {
+                    "user_id": current_user,
+                    "name": self.user_config.get_preference("user_info.name", "未知用户"),
+                    "role": self.user_config.get_user_role(),
+                    "last_login": self.user_config.get_preference("user_info.last_login", ""),
+                    "interaction_preferences": self.user_config.get_preference("interaction_preferences", {})
+                }
+                log.debug("✅ 用户信息获取完成")
+                
+                # 获取用户常用指令
+                log.debug("📝 获取用户常用指令...")
+                user_sections["common_commands"] = self.user_config.get_common_commands()
+                log.debug("✅ 常用指令获取完成")
+                
+                # 获取用户交互统计
+                log.debug("📈 获取用户交互统计...")
+                user_sections["interaction_stats"] = self.user_config.get_interaction_stats()
+                log.debug("✅ 交互统计获取完成")
             
-            # 获取用户交互统计
-            print("📈 获取用户交互统计...")
-            dashboard["interaction_stats"] = self.user_config.get_interaction_stats()
-            print("✅ 交互统计获取完成")
+            self._dashboard_cache = (cache_key, time.monotonic(), user_sections)
+        
+        # 返回缓存的深拷贝，调用方修改结果不会影响缓存
+        dashboard = copy.deepcopy(user_sections)
         
         # 系统状态
-        print("🎛️ 获取系统状态...")
+        log.debug("🎛️ 获取系统状态...")
         dashboard["system_status"] = {
             "session_id": self.current_session_id,
-            "session_duration": time.time() - self.session_start_time if self.session_start_time else 0
+            "session_duration": time.monotonic() - self.session_start_time if self.session_start_time else 0
         }
-        print("✅ 系统状态获取完成")
+        log.debug("✅ 系统状态获取完成")
         
-        print("📊 用户控制面板构建完成")
+        log.debug("📊 用户控制面板构建完成")
         return dashboard
     
     def get_system_analytics(self, days: int = 7) -> Dict[str, Any]:
-        """获取系统分析报告"""
-        analytics = {}
+        """获取系统分析报告（各项查询相互独立，并发执行）"""
+        queries = {}
         
         # 交互统计
         if self.user_config.current_user:
-            analytics["user_stats"] = self.logger.get_interaction_stats(
-                user_id=self.user_config.current_user, 
-                days=days
-            )
-            analytics["user_behavior"] = self.logger.get_user_behavior_analysis(
-                user_id=self.user_config.current_user,
-                days=days
-            )
+            queries["user_stats"] = (self.logger.get_interaction_stats,
+                                     dict(user_id=self.user_config.current_user, days=days))
+            queries["user_behavior"] = (self.logger.get_user_behavior_analysis,
+                                        dict(user_id=self.user_config.current_user, days=days))
         
         # 全局统计
-        analytics["global_stats"] = self.logger.get_interaction_stats(days=days)
+        queries["global_stats"] = (self.logger.get_interaction_stats, dict(days=days))
         
         # 错误分析
-        analytics["error_analysis"] = self.logger.get_error_analysis(days=days)
+        queries["error_analysis"] = (self.logger.get_error_analysis, dict(days=days))
         
-        return analytics
+        # 日志查询使用各线程自己的只读连接
+        futures = {name: self._analytics_pool.submit(func, **kwargs)
+                   for name, (func, kwargs) in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
     
     def update_user_preference(self, key: str, value: Any) -> bool:
         """更新用户偏好设置"""
@@ -204,6 +248,10 @@ class SystemManager:
         success = self.user_config.set_preference(key, value)
         
         if success:
+            self._dashboard_cache = None
+            if key.startswith("common_commands"):
+                self._command_categories = None
+            
             # 记录偏好更改
             self.logger.log_user_behavior(
                 behavior_type="preference_updated",
@@ -236,17 +284,24 @@ class SystemManager:
 
 # 全局系统管理器实例 - 使用延迟初始化
 _system_manager_instance = None
+_system_manager_lock = threading.Lock()
 
 def get_system_manager():
-    """获取系统管理器实例（延迟初始化）"""
+    """获取系统管理器实例（延迟初始化，多线程首次访问时只创建一个实例）"""
     global _system_manager_instance
     if _system_manager_instance is None:
-        _system_manager_instance = SystemManager()
+        with _system_manager_lock:
+            if _system_manager_instance is None:
+                _system_manager_instance = SystemManager()
     return _system_manager_instance
 
 # 为了保持向后兼容性，提供一个属性访问器
 class SystemManagerProxy:
     def __getattr__(self, name):
-        return getattr(get_system_manager(), name)
+        value = getattr(get_system_manager(), name)
+        # 缓存已绑定的方法，之后的访问直接命中实例字典；数据属性可能被重新赋值，不做缓存
+        if callable(value):
+            object.__setattr__(self, name, value)
+        return value
 
 system_manager = SystemManagerProxy() 
\ No newline at end of file
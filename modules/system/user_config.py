@@ -5,27 +5,72 @@
 负责保存和管理驾驶员的常用指令和交互习惯
 """
 
+import atexit
+import functools
 import json
 import os
+import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import threading
+from collections import deque
+
+from .file_utils import atomic_write_bytes
+
+
+def _encode_ring_buffer(value):
+    """环形缓冲按列表写出，其他无法序列化的对象照常报错"""
+    if isinstance(value, deque):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# 用户配置的 JSON 编码器（复用同一实例）
+_CONFIG_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2, default=_encode_ring_buffer)
 
 
 class UserConfigManager:
-    """用户个性化配置管理器"""
+    """用户个性化配置管理器
+    
+    结构性修改在锁内复制被修改路径上的字典后整体替换 user_config（写时复制），
+    读操作直接读取当前的 user_config 引用，无需加锁。高频的交互模式统计
+    只在锁内原地更新已有键的值或追加到环形缓冲，不改变字典结构。
+    """
+    
+    # 合并写回：累计修改次数或距上次保存的秒数达到阈值时写盘
+    FLUSH_THRESHOLD = 20
+    FLUSH_INTERVAL = 2.0
+    
+    # 常用指令与交互时间记录的保留条数
+    MAX_COMMANDS_PER_CATEGORY = 20
+    MAX_INTERACTION_TIMES = 1000
     
     def __init__(self, config_dir: str = "data/user_configs"):
         self.config_dir = config_dir
         self.current_user = None
         self.user_config = {}
-        self.lock = threading.Lock()
+        self.lock = threading.RLock()
+        
+        # 尚未写盘的修改次数与上次写盘时间
+        self._dirty_count = 0
+        self._last_flush = time.monotonic()
+        
+        # list_users 的解析结果缓存：文件名 -> (修改时间, 文件大小, 用户摘要)
+        self._list_cache = {}
         
         # 确保配置目录存在
         os.makedirs(config_dir, exist_ok=True)
         
-        # 默认配置
-        self.default_config = {
+        # 启动合并写回线程，退出前保存尚未写盘的修改
+        self._flush_thread = threading.Thread(target=self._flush_loop,
+                                              name="UserConfigFlush", daemon=True)
+        self._flush_thread.start()
+        atexit.register(self.flush)
+    
+    @classmethod
+    def _make_default_config(cls) -> Dict[str, Any]:
+        """生成一份新的默认配置（每次返回独立的字典，用户之间不共享可变状态）"""
+        return {
             "user_info": {
                 "name": "",
                 "role": "driver",  # driver 或 passenger
@@ -56,6 +101,51 @@ class UserConfigManager:
             }
         }
     
+    def _mark_dirty(self):
+        """记录一次待保存的修改，达到阈值时立即写盘（调用方需持有锁）"""
+        self._dirty_count += 1
+        if (self._dirty_count >= self.FLUSH_THRESHOLD
+                or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL):
+            self._write_current_config()
+    
+    def _write_current_config(self):
+        """将当前用户配置写盘并清除待保存标记（调用方需持有锁）"""
+        config_path = os.path.join(self.config_dir, f"{self.current_user}.json")
+        self._atomic_write_json(config_path, self.user_config)
+        self._dirty_count = 0
+        self._last_flush = time.monotonic()
+    
+    def flush(self):
+        """立即保存尚未写盘的修改"""
+        with self.lock:
+            if self._dirty_count and self.current_user:
+                self._write_current_config()
+    
+    def _flush_loop(self):
+        """后台线程：定期保存尚未写盘的修改"""
+        while True:
+            time.sleep(self.FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ 保存用户配置失败: {e}")
+    
+    @staticmethod
+    def _ring_buffer(items, maxlen: int) -> deque:
+        """复制为新的定长环形缓冲（从 JSON 加载的列表同样适用），不修改读者可能持有的旧对象"""
+        return deque(items, maxlen=maxlen)
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _split_key(key: str) -> tuple:
+        """拆分点分隔的配置键（常用键只拆分一次）"""
+        return tuple(key.split('.'))
+    
+    def _atomic_write_json(self, path: str, data: Dict[str, Any]):
+        """原子写入JSON文件"""
+        # 一次性编码为字节串后整块写入，比 json.dump 分段写入更快
+        atomic_write_bytes(path, _CONFIG_ENCODER.encode(data).encode('utf-8'))
+    
     def create_user(self, user_id: str, name: str, role: str = "driver") -> bool:
         """创建新用户配置"""
         try:
@@ -66,15 +156,14 @@ class UserConfigManager:
                     return False  # 用户已存在
                 
                 # 创建用户配置
-                user_config = self.default_config.copy()
+                user_config = self._make_default_config()
                 user_config["user_info"]["name"] = name
                 user_config["user_info"]["role"] = role
                 user_config["user_info"]["created_at"] = datetime.now().isoformat()
                 user_config["user_info"]["last_login"] = datetime.now().isoformat()
                 
                 # 保存配置
-                with open(config_path, 'w', encoding='utf-8') as f:
-                    json.dump(user_config, f, ensure_ascii=False, indent=2)
+                self._atomic_write_json(config_path, user_config)
                 
                 return True
                 
@@ -90,17 +179,21 @@ class UserConfigManager:
                 if not os.path.exists(config_path):
                     return False
                 
+                # 切换用户前保存上一个用户尚未写盘的修改
+                if self._dirty_count and self.current_user:
+                    self._write_current_config()
+                
                 with open(config_path, 'r', encoding='utf-8') as f:
-                    self.user_config = json.load(f)
+                    user_config = json.load(f)
                 
-                self.current_user = user_id
+                # 更新最后登录时间后再发布，读者不会看到修改到一半的配置
+                user_config["user_info"]["last_login"] = datetime.now().isoformat()
                 
-                # 更新最后登录时间
-                self.user_config["user_info"]["last_login"] = datetime.now().isoformat()
+                self.user_config = user_config
+                self.current_user = user_id
                 
                 # 直接保存，避免死锁（因为已经持有锁）
-                with open(config_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.user_config, f, ensure_ascii=False, indent=2)
+                self._write_current_config()
                 
                 return True
                 
@@ -114,15 +207,11 @@ class UserConfigManager:
         
         try:
             with self.lock:
-                config_path = os.path.join(self.config_dir, f"{self.current_user}.json")
-                
                 # 检查目录是否存在
                 if not os.path.exists(self.config_dir):
                     os.makedirs(self.config_dir, exist_ok=True)
                 
-                # 直接写入，不使用临时文件
-                with open(config_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.user_config, f, ensure_ascii=False, indent=2)
+                self._write_current_config()
                 
                 return True
                 
@@ -135,17 +224,16 @@ class UserConfigManager:
             return False
         
         with self.lock:
-            commands = self.user_config["common_commands"][category]
-            if command not in commands:
+            config = self.user_config
+            common_commands = config["common_commands"]
+            if command not in common_commands[category]:
+                # 每个类别最多保存20条，使用环形缓冲自动淘汰最旧的指令
+                commands = self._ring_buffer(common_commands[category], self.MAX_COMMANDS_PER_CATEGORY)
                 commands.append(command)
-                # 限制每个类别最多保存20条
-                if len(commands) > 20:
-                    commands.pop(0)
+                self.user_config = {**config, "common_commands": {**common_commands, category: commands}}
                 
-                # 直接保存，避免死锁（因为已经持有锁）
-                config_path = os.path.join(self.config_dir, f"{self.current_user}.json")
-                with open(config_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.user_config, f, ensure_ascii=False, indent=2)
+                # 标记待保存，由合并写回统一落盘（已持有锁）
+                self._mark_dirty()
     
     def update_interaction_pattern(self, interaction_type: str, value: str):
         """更新交互模式统计"""
@@ -153,67 +241,80 @@ class UserConfigManager:
             return
         
         with self.lock:
+            # 每次交互都会执行：不替换 user_config，只原地替换已有键的值，读者遍历时字典大小不变
             patterns = self.user_config["interaction_patterns"]
             
             if interaction_type == "gesture":
-                if value not in patterns["most_used_gestures"]:
-                    patterns["most_used_gestures"][value] = 0
-                patterns["most_used_gestures"][value] += 1
+                self._increment_count(patterns, "most_used_gestures", value)
                 
             elif interaction_type == "voice":
-                if value not in patterns["voice_command_frequency"]:
-                    patterns["voice_command_frequency"][value] = 0
-                patterns["voice_command_frequency"][value] += 1
+                self._increment_count(patterns, "voice_command_frequency", value)
             
-            # 记录交互时间
-            patterns["interaction_times"].append(datetime.now().isoformat())
-            # 只保留最近1000条记录
-            if len(patterns["interaction_times"]) > 1000:
-                patterns["interaction_times"] = patterns["interaction_times"][-1000:]
+            # 记录交互时间（Unix 时间戳浮点数，需要展示时再格式化；旧配置中的 ISO 字符串保持不变），
+            # 只保留最近1000条记录；从 JSON 加载的列表首次转换为环形缓冲，之后 O(1) 追加
+            interaction_times = patterns["interaction_times"]
+            if not isinstance(interaction_times, deque):
+                interaction_times = patterns["interaction_times"] = self._ring_buffer(
+                    interaction_times, self.MAX_INTERACTION_TIMES)
+            interaction_times.append(time.time())
             
-            # 直接保存，避免死锁（因为已经持有锁）
-            config_path = os.path.join(self.config_dir, f"{self.current_user}.json")
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.user_config, f, ensure_ascii=False, indent=2)
+            # 标记待保存，由合并写回统一落盘（已持有锁）
+            self._mark_dirty()
+    
+    @staticmethod
+    def _increment_count(patterns: Dict[str, Any], name: str, value: str):
+        """计数加一：已有键原地更新，新键则复制计数字典后替换（调用方需持有锁）"""
+        counts = patterns[name]
+        if value in counts:
+            counts[value] += 1
+        else:
+            patterns[name] = {**counts, value: 1}
     
     def get_preference(self, key: str, default=None):
         """获取用户偏好设置"""
         if not self.current_user:
             return default
         
-        keys = key.split('.')
+        keys = self._split_key(key)
         value = self.user_config
         
         try:
             for k in keys:
                 value = value[k]
-            return value
+            return self._to_plain(value)
         except (KeyError, TypeError):
             return default
     
+    @classmethod
+    def _to_plain(cls, value):
+        """内部的环形缓冲以列表形式返回给调用方（含环形缓冲的字典逐层复制）"""
+        if isinstance(value, deque):
+            return list(value)
+        if isinstance(value, dict):
+            return {k: cls._to_plain(v) for k, v in value.items()}
+        return value
+    
     def set_preference(self, key: str, value: Any):
         """设置用户偏好"""
         if not self.current_user:
             return False
         
-        keys = key.split('.')
-        config = self.user_config
+        keys = self._split_key(key)
         
         try:
             with self.lock:
-                # 导航到最后一层
+                # 导航到最后一层，沿途复制各级字典
+                new_config = config = dict(self.user_config)
                 for k in keys[:-1]:
-                    if k not in config:
-                        config[k] = {}
+                    config[k] = dict(config[k]) if k in config else {}
                     config = config[k]
                 
                 # 设置值
                 config[keys[-1]] = value
+                self.user_config = new_config
                 
-                # 直接保存，避免死锁（因为已经持有锁）
-                config_path = os.path.join(self.config_dir, f"{self.current_user}.json")
-                with open(config_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.user_config, f, ensure_ascii=False, indent=2)
+                # 标记待保存，由合并写回统一落盘（已持有锁）
+                self._mark_dirty()
                 
                 return True
                 
@@ -231,8 +332,8 @@ class UserConfigManager:
         
         commands = self.user_config.get("common_commands", {})
         if category:
-            return {category: commands.get(category, [])}
-        return commands
+            return {category: list(commands.get(category, []))}
+        return {name: list(items) for name, items in commands.items()}
     
     def get_interaction_stats(self) -> Dict[str, Any]:
         """获取交互统计信息"""
@@ -262,20 +363,38 @@ class UserConfigManager:
         """列出所有用户"""
         users = []
         try:
-            for filename in os.listdir(self.config_dir):
-                if filename.endswith('.json'):
-                    user_id = filename[:-5]  # 移除.json后缀
-                    config_path = os.path.join(self.config_dir, filename)
+            cache = self._list_cache
+            seen = set()
+            with os.scandir(self.config_dir) as entries:
+                for entry in entries:
+                    if not entry.name.endswith('.json'):
+                        continue
+                    
+                    seen.add(entry.name)
+                    st = entry.stat()
+                    cached = cache.get(entry.name)
                     
-                    with open(config_path, 'r', encoding='utf-8') as f:
+                    # 文件未变化时复用上次的解析结果
+                    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                        users.append(dict(cached[2]))
+                        continue
+                    
+                    user_id = entry.name[:-5]  # 移除.json后缀
+                    with open(entry.path, 'r', encoding='utf-8') as f:
                         config = json.load(f)
                     
-                    users.append({
+                    user = {
                         "user_id": user_id,
                         "name": config.get("user_info", {}).get("name", user_id),
                         "role": config.get("user_info", {}).get("role", "unknown"),
                         "last_login": config.get("user_info", {}).get("last_login", "")
-                    })
+                    }
+                    cache[entry.name] = (st.st_mtime_ns, st.st_size, user)
+                    users.append(dict(user))
+            
+            # 清理已删除文件的缓存
+            for filename in cache.keys() - seen:
+                cache.pop(filename, None)
         except Exception as e:
             print(f"❌ 获取用户列表失败: {e}")
         
@@ -284,12 +403,15 @@ class UserConfigManager:
 
 # 全局用户配置管理器实例 - 使用延迟初始化
 _user_config_manager_instance = None
+_user_config_manager_lock = threading.Lock()
 
 def get_user_config_manager():
-    """获取用户配置管理器实例（延迟初始化）"""
+    """获取用户配置管理器实例（延迟初始化，多线程首次访问时只创建一个实例）"""
     global _user_config_manager_instance
     if _user_config_manager_instance is None:
-        _user_config_manager_instance = UserConfigManager()
+        with _user_config_manager_lock:
+            if _user_config_manager_instance is None:
+                _user_config_manager_instance = UserConfigManager()
     return _user_config_manager_instance
 
 # 为了保持向后兼容性，提供一个属性访问器
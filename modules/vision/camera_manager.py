@@ -6,14 +6,25 @@ import time
 class CameraManager:
     """
     公共摄像头管理器，用于统一管理摄像头资源
-    支持多个模块共享同一个摄像头
+    支持多个模块共享同一个摄像头：后台线程持续采集，各使用者读取最新帧
     """
     
+    # 等待新帧的最长时间（秒）
+    FRAME_TIMEOUT = 1.0
+    
     def __init__(self, camera_id=0):
         self.camera_id = camera_id
         self.cap = None
         self.is_opened = False
         self.lock = threading.Lock()
+        
+        # 最新帧及其序号，由采集线程写入
+        self._frame_cv = threading.Condition()
+        self._latest = (False, None)
+        self._seq = 0
+        self._local = threading.local()  # 每个使用者线程已读取到的帧序号
+        self._grab_thread = None
+        
         self._initialize_camera()
     
     def _initialize_camera(self):
@@ -26,26 +37,62 @@ class CameraManager:
                 if not self.cap.isOpened():
                     raise RuntimeError(f"摄像头 {self.camera_id} 无法打开")
             
+            # 驱动端只缓存一帧，采集线程总是拿到最新画面（后端不支持时忽略）
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            
             self.is_opened = True
             print(f"摄像头 {self.camera_id} 初始化成功")
             
+            # 启动采集线程
+            self._grab_thread = threading.Thread(target=self._grab_loop,
+                                                 name=f"CameraGrab-{self.camera_id}", daemon=True)
+            self._grab_thread.start()
+            
         except Exception as e:
             self.is_opened = False
             raise RuntimeError(f"摄像头初始化失败: {e}")
     
+    def _grab_loop(self):
+        """采集线程：持续读取摄像头帧并发布为最新帧"""
+        while self.is_opened:
+            with self.lock:
+                if self.cap is None:
+                    break
+                ret, frame = self.cap.read()
+            
+            with self._frame_cv:
+                self._latest = (ret, frame)
+                self._seq += 1
+                self._frame_cv.notify_all()
+            
+            if not ret:
+                time.sleep(0.01)
+        
+        # 唤醒仍在等待的使用者
+        with self._frame_cv:
+            self._frame_cv.notify_all()
+    
     def read_frame(self):
         """
-        读取摄像头帧
+        读取摄像头帧（等待当前线程尚未读取过的最新帧，多个使用者可并发读取）
+        
+        返回的帧在各使用者之间共享，需要修改时请先复制
         
         Returns:
             tuple: (success, frame) - success为布尔值，frame为图像帧
         """
         if not self.is_opened or self.cap is None:
             return False, None
-            
-        with self.lock:
-            ret, frame = self.cap.read()
-            return ret, frame
+        
+        last_seq = getattr(self._local, "seq", 0)
+        with self._frame_cv:
+            if not self._frame_cv.wait_for(lambda: self._seq != last_seq or not self.is_opened,
+                                           timeout=self.FRAME_TIMEOUT):
+                return False, None
+            if not self.is_opened:
+                return False, None
+            self._local.seq = self._seq
+            return self._latest
     
     def get_property(self, prop):
         """
@@ -92,11 +139,17 @@ class CameraManager:
     
     def release(self):
         """释放摄像头资源"""
+        self.is_opened = False
         with self.lock:
             if self.cap is not None:
                 self.cap.release()
                 self.cap = None
-            self.is_opened = False
+        
+        # 等待采集线程退出
+        grab_thread = self._grab_thread
+        if grab_thread is not None and grab_thread is not threading.current_thread():
+            grab_thread.join(timeout=self.FRAME_TIMEOUT)
+        self._grab_thread = None
     
     def __del__(self):
         """析构函数，确保资源被释放"""
@@ -105,6 +158,7 @@ class CameraManager:
 
 # 全局摄像头管理器实例
 _camera_manager = None
+_camera_manager_lock = threading.Lock()
 
 
 def get_camera_manager(camera_id=0):
@@ -119,13 +173,17 @@ def get_camera_manager(camera_id=0):
     """
     global _camera_manager
     if _camera_manager is None:
-        _camera_manager = CameraManager(camera_id)
+        # 双重检查加锁，避免多个线程同时打开摄像头
+        with _camera_manager_lock:
+            if _camera_manager is None:
+                _camera_manager = CameraManager(camera_id)
     return _camera_manager
 
 
 def release_camera_manager():
     """释放全局摄像头管理器"""
     global _camera_manager
-    if _camera_manager is not None:
-        _camera_manager.release()
-        _camera_manager = None 
\ No newline at end of file
+    with _camera_manager_lock:
+        if _camera_manager is not None:
+            _camera_manager.release()
+            _camera_manager = None 
\ No newline at end of file
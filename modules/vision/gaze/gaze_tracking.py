@@ -2,6 +2,7 @@ from __future__ import division
 import os
 import cv2
 import dlib
+import numpy as np
 from .eye import Eye
 from .calibration import Calibration
 
@@ -13,6 +14,11 @@ class GazeTracking(object):
     and pupils and allows to know if the eyes are open or closed
     """
 
+    # 人脸检测在缩小后的灰度图上进行，特征点仍在原分辨率上定位
+    DETECTION_SCALE = 0.5
+    # 每隔若干帧重新检测一次人脸，其余帧沿用上次的人脸框
+    DETECTION_INTERVAL = 5
+
     def __init__(self):
         self.frame = None
         self.eye_left = None
@@ -22,12 +28,23 @@ class GazeTracking(object):
         # 添加状态维持变量
         self.last_gaze_direction = "center"  # 可能的值: "left", "right", "center"
         
-        # 为每个方向维护独立的历史记录
-        self.right_gaze_history = []  # 用于存储右视线历史
-        self.left_gaze_history = []   # 用于存储左视线历史
-        self.center_gaze_history = [] # 用于存储中央视线历史
+        # 为每个方向维护独立的历史记录：最近 history_size 帧的检测结果按位保存在整数中
+        # （最低位为最新一帧），另记录已有的帧数
+        self._right_mask = 0   # 右视线历史
+        self._left_mask = 0    # 左视线历史
+        self._center_mask = 0  # 中央视线历史
+        self._right_samples = 0
+        self._left_samples = 0
+        self._center_samples = 0
         self.history_size = 10  # 增加历史记录大小，提高稳定性
         
+        # 当前帧的计算结果缓存（瞳孔坐标、视线比率），每次 refresh 时清空
+        self._frame_cache = {}
+        
+        # 上次检测到的人脸框（原分辨率）及帧计数
+        self._last_face = None
+        self._frame_idx = 0
+        
         # _face_detector is used to detect faces
         self._face_detector = dlib.get_frontal_face_detector()
 
@@ -38,25 +55,41 @@ class GazeTracking(object):
             raise FileNotFoundError(f"找不到面部特征点预测器: {model_path}")
         self._predictor = dlib.shape_predictor(model_path)
 
+    def _cached(self, key, compute):
+        """Returns the value of compute() for the current frame, computing it at most once"""
+        cache = self._frame_cache
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
     @property
     def pupils_located(self):
         """Check that the pupils have been located"""
-        try:
-            int(self.eye_left.pupil.x)
-            int(self.eye_left.pupil.y)
-            int(self.eye_right.pupil.x)
-            int(self.eye_right.pupil.y)
-            return True
-        except Exception:
-            return False
+        return self._cached("pupils_located", self._locate_pupils)
 
-    def _analyze(self):
+    def _locate_pupils(self):
+        # 直接检查眼睛、瞳孔及其坐标是否存在，不借助 int() 转换与异常处理
+        for eye in (self.eye_left, self.eye_right):
+            pupil = eye.pupil if eye is not None else None
+            if pupil is None or pupil.x is None or pupil.y is None:
+                return False
+        return True
+
+    def _analyze(self, gray=None):
         """Detects the face and initialize Eye objects"""
-        frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
-        faces = self._face_detector(frame)
+        frame = gray if gray is not None else cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+
+        if self._last_face is None or self._frame_idx % self.DETECTION_INTERVAL == 0:
+            self._last_face = self._detect_face(frame)
+        self._frame_idx += 1
+
+        if self._last_face is None:
+            self.eye_left = None
+            self.eye_right = None
+            return
 
         try:
-            landmarks = self._predictor(frame, faces[0])
+            landmarks = self._predictor(frame, self._last_face)
             self.eye_left = Eye(frame, landmarks, 0, self.calibration)
             self.eye_right = Eye(frame, landmarks, 1, self.calibration)
 
@@ -64,17 +97,35 @@ class GazeTracking(object):
             self.eye_left = None
             self.eye_right = None
 
-    def refresh(self, frame):
+    def _detect_face(self, frame):
+        """Returns the first face found in the grayscale frame, or None"""
+        scale = self.DETECTION_SCALE
+        small = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        faces = self._face_detector(small)
+        if not faces:
+            return None
+
+        face = faces[0]
+        return dlib.rectangle(int(face.left() / scale), int(face.top() / scale),
+                              int(face.right() / scale), int(face.bottom() / scale))
+
+    def refresh(self, frame, gray=None):
         """Refreshes the frame and analyzes it.
 
         Arguments:
             frame (numpy.ndarray): The frame to analyze
+            gray (numpy.ndarray): Optional grayscale version of the frame,
+                reused instead of converting it again
         """
         self.frame = frame
-        self._analyze()
+        self._frame_cache.clear()
+        self._analyze(gray)
 
     def pupil_left_coords(self):
         """Returns the coordinates of the left pupil"""
+        return self._cached("pupil_left_coords", self._pupil_left_coords)
+
+    def _pupil_left_coords(self):
         if self.pupils_located:
             x = self.eye_left.origin[0] + self.eye_left.pupil.x
             y = self.eye_left.origin[1] + self.eye_left.pupil.y
@@ -82,6 +133,9 @@ class GazeTracking(object):
 
     def pupil_right_coords(self):
         """Returns the coordinates of the right pupil"""
+        return self._cached("pupil_right_coords", self._pupil_right_coords)
+
+    def _pupil_right_coords(self):
         if self.pupils_located:
             x = self.eye_right.origin[0] + self.eye_right.pupil.x
             y = self.eye_right.origin[1] + self.eye_right.pupil.y
@@ -92,6 +146,9 @@ class GazeTracking(object):
         horizontal direction of the gaze. The extreme right is 0.0,
         the center is 0.5 and the extreme left is 1.0
         """
+        return self._cached("horizontal_ratio", self._horizontal_ratio)
+
+    def _horizontal_ratio(self):
         if self.pupils_located:
             pupil_left = self.eye_left.pupil.x / (self.eye_left.center[0] * 2 - 10)
             pupil_right = self.eye_right.pupil.x / (self.eye_right.center[0] * 2 - 10)
@@ -102,6 +159,9 @@ class GazeTracking(object):
         vertical direction of the gaze. The extreme top is 0.0,
         the center is 0.5 and the extreme bottom is 1.0
         """
+        return self._cached("vertical_ratio", self._vertical_ratio)
+
+    def _vertical_ratio(self):
         if self.pupils_located:
             pupil_left = self.eye_left.pupil.y / (self.eye_left.center[1] * 2 - 10)
             pupil_right = self.eye_right.pupil.y / (self.eye_right.center[1] * 2 - 10)
@@ -114,12 +174,11 @@ class GazeTracking(object):
             is_right_now = self.horizontal_ratio() <= 0.3  # 原来是0.35，放宽一些
             
             # 更新历史记录
-            self.right_gaze_history.append(1 if is_right_now else 0)
-            if len(self.right_gaze_history) > self.history_size:
-                self.right_gaze_history.pop(0)
+            self._right_mask = ((self._right_mask << 1) | is_right_now) & ((1 << self.history_size) - 1)
+            self._right_samples = min(self._right_samples + 1, self.history_size)
             
             # 只有当历史记录中大部分都是右视线时，才认为是右视线
-            right_ratio = sum(self.right_gaze_history) / len(self.right_gaze_history)
+            right_ratio = self._right_mask.bit_count() / self._right_samples
             return right_ratio >= 0.8  # 70%以上帧检测到右视线，提高阈值增加稳定性
     
     def is_left(self):
@@ -129,12 +188,11 @@ class GazeTracking(object):
             is_left_now = self.horizontal_ratio() >= 0.7  # 原来是0.65，放宽一些
             
             # 更新历史记录
-            self.left_gaze_history.append(1 if is_left_now else 0)
-            if len(self.left_gaze_history) > self.history_size:
-                self.left_gaze_history.pop(0)
+            self._left_mask = ((self._left_mask << 1) | is_left_now) & ((1 << self.history_size) - 1)
+            self._left_samples = min(self._left_samples + 1, self.history_size)
             
             # 只有当历史记录中大部分都是左视线时，才认为是左视线
-            left_ratio = sum(self.left_gaze_history) / len(self.left_gaze_history)
+            left_ratio = self._left_mask.bit_count() / self._left_samples
             return left_ratio >= 0.8  # 70%以上帧检测到左视线，提高阈值增加稳定性
     
     def is_center(self):
@@ -145,12 +203,11 @@ class GazeTracking(object):
             is_center_now = (ratio > 0.30 and ratio < 0.70)  # 在左右阈值之间认为是中心
             
             # 更新历史记录
-            self.center_gaze_history.append(1 if is_center_now else 0)
-            if len(self.center_gaze_history) > self.history_size:
-                self.center_gaze_history.pop(0)
+            self._center_mask = ((self._center_mask << 1) | is_center_now) & ((1 << self.history_size) - 1)
+            self._center_samples = min(self._center_samples + 1, self.history_size)
             
             # 计算中心视线的比例
-            center_ratio = sum(self.center_gaze_history) / len(self.center_gaze_history)
+            center_ratio = self._center_mask.bit_count() / self._center_samples
             
             # 如果左右视线都不明显，且中心视线比例足够高，则认为是中心视线
             is_right = self.is_right()
@@ -171,9 +228,21 @@ class GazeTracking(object):
             blinking_ratio = (self.eye_left.blinking + self.eye_right.blinking) / 2
             return blinking_ratio > 5.2  # 保持原有阈值
 
-    def annotated_frame(self):
-        """Returns the main frame with pupils highlighted"""
-        frame = self.frame.copy()
+    def annotated_frame(self, copy=True, out=None):
+        """Returns the main frame with pupils highlighted
+
+        Arguments:
+            copy (bool): Draw on a copy of the frame; if False, draw on the frame itself
+            out (numpy.ndarray): Optional buffer with the frame's shape and dtype,
+                reused instead of allocating a new copy
+        """
+        if out is not None and out.shape == self.frame.shape and out.dtype == self.frame.dtype:
+            np.copyto(out, self.frame)
+            frame = out
+        elif copy:
+            frame = self.frame.copy()
+        else:
+            frame = self.frame
 
         if self.pupils_located:
             color = (0, 255, 0)
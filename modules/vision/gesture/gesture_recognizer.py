@@ -7,44 +7,78 @@ Usage:
     for event in GestureRecognizer(camera_id=0).run():
         print(event)   # {'gesture': '握拳', 'conf': 0.90, 'ts': 1715854812.123}
 """
+import functools
+import threading
 import time
 import cv2
 import mediapipe as mp
 import numpy as np
+from numba import njit
 import csv
 import os
-import itertools
-import copy
 
 from .keypoint_classifier import KeyPointClassifier
+from ..camera_manager import get_camera_manager
 
 mp_hands = mp.solutions.hands
 
+# OpenCV 线程池上限：全部核心并行反而会与 MediaPipe 推理线程争抢
+OPENCV_THREADS = 4
+cv2.setNumThreads(min(OPENCV_THREADS, os.cpu_count() or 1))
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_hands(camera_id, max_hands, det_conf, track_conf):
+    """同一摄像头、同一配置的 MediaPipe Hands 在进程内只创建一次，返回 (hands, lock)
+
+    Hands 在视频模式下按帧跟踪且非线程安全，因此按摄像头区分实例，并通过锁串行调用 process
+    """
+    hands = mp_hands.Hands(
+        static_image_mode=False,
+        max_num_hands=max_hands,
+        min_detection_confidence=det_conf,
+        min_tracking_confidence=track_conf,
+    )
+    return hands, threading.Lock()
+
 
 # Helper functions from hand-keypoint-classification-model-zoo/main.py
 # (calc_bounding_rect is not used in the new _recognize_gesture, so omitted)
+# 21 个关键点按整组数组运算，避免逐点循环与 deepcopy
 def calc_landmark_list(image_width, image_height, landmarks):
-    landmark_point = []
-    for _, landmark in enumerate(landmarks.landmark):
-        landmark_x = min(int(landmark.x * image_width), image_width - 1)
-        landmark_y = min(int(landmark.y * image_height), image_height - 1)
-        landmark_point.append([landmark_x, landmark_y])
+    # 直接使用归一化坐标的浮点值，只按宽高缩放以保持画面宽高比；
+    # 不再截断为整数像素（后续归一化会抵消整体尺度）
+    landmark_point = np.fromiter(
+        (value for landmark in landmarks.landmark for value in (landmark.x, landmark.y)),
+        dtype=np.float32, count=len(landmarks.landmark) * 2).reshape(-1, 2)
+    landmark_point *= (image_width, image_height)
+    # 与训练数据的预处理一致，超出画面右/下边界的点夹到边界（一次向量化 min，原地完成）
+    np.minimum(landmark_point, (image_width - 1, image_height - 1), out=landmark_point)
     return landmark_point
 
+@njit('float32[::1](float32[:, ::1])', cache=True)
+def _normalize_landmarks(points):
+    # 以首个关键点为原点展开为一维，并按最大绝对值归一化；
+    # 42 个元素的小数组用编译后的标量循环，避免 NumPy 逐次调用的开销
+    n = points.shape[0]
+    out = np.empty(n * 2, np.float32)
+    base_x = points[0, 0]
+    base_y = points[0, 1]
+    max_value = np.float32(0.0)
+    for i in range(n):
+        dx = points[i, 0] - base_x
+        dy = points[i, 1] - base_y
+        out[2 * i] = dx
+        out[2 * i + 1] = dy
+        max_value = max(max_value, abs(dx), abs(dy))
+    if max_value != 0:
+        for i in range(n * 2):
+            out[i] /= max_value
+    return out
+
 def pre_process_landmark(landmark_list):
-    temp_landmark_list = copy.deepcopy(landmark_list)
-    base_x, base_y = 0, 0
-    for index, landmark_point in enumerate(temp_landmark_list):
-        if index == 0:
-            base_x, base_y = landmark_point[0], landmark_point[1]
-        temp_landmark_list[index][0] = temp_landmark_list[index][0] - base_x
-        temp_landmark_list[index][1] = temp_landmark_list[index][1] - base_y
-    temp_landmark_list = list(itertools.chain.from_iterable(temp_landmark_list))
-    max_value = max(list(map(abs, temp_landmark_list)))
-    def normalize_(n):
-        return n / max_value if max_value != 0 else 0
-    temp_landmark_list = list(map(normalize_, temp_landmark_list))
-    return temp_landmark_list
+    # 直接生成分类器所需的 float32 特征
+    return _normalize_landmarks(np.ascontiguousarray(landmark_list, dtype=np.float32))
 
 
 class GestureRecognizer:
@@ -56,19 +90,13 @@ class GestureRecognizer:
         track_conf: float = 0.5,
         model_name: str = 'avazahedi',
     ):
-        self.cap = cv2.VideoCapture(camera_id)
-        if not self.cap.isOpened():
-            self.cap.release()
-            self.cap = cv2.VideoCapture(camera_id)
-            if not self.cap.isOpened():
-                 raise RuntimeError(f"摄像头 {camera_id} 无法打开")
-
-        self.hands = mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=max_hands,
-            min_detection_confidence=det_conf,
-            min_tracking_confidence=track_conf,
-        )
+        # 与其他视觉模块共用同一个摄像头
+        self.cam = get_camera_manager(camera_id)
+        if not self.cam.is_opened:
+            raise RuntimeError(f"摄像头 {camera_id} 无法打开")
+
+        # 同一摄像头的多个识别器共用一个 Hands 实例
+        self.hands, self._hands_lock = _shared_hands(camera_id, max_hands, det_conf, track_conf)
 
         # Load KeyPointClassifier
         script_dir = os.path.dirname(__file__)
@@ -82,68 +110,100 @@ class GestureRecognizer:
 
         self.keypoint_classifier = KeyPointClassifier(model_path=model_path)
         with open(label_path, encoding='utf-8-sig') as f:
-            self.keypoint_classifier_labels = [row[0] for row in csv.reader(f)]
+            self.keypoint_classifier_labels = tuple(row[0] for row in csv.reader(f))
+        self._n_labels = len(self.keypoint_classifier_labels)
         
-        self.image_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.image_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.image_width = self.cam.width
+        self.image_height = self.cam.height
+
+        # RGB 转换的输出缓冲，首帧时按帧尺寸分配并在之后复用
+        self._rgb_buf = None
 
 
     def _recognize_gesture(self, hand_landmarks):
+        if not self._n_labels:
+            return None, 0.0
+
         landmark_list = calc_landmark_list(self.image_width, self.image_height, hand_landmarks)
 
         pre_processed_landmark_list = pre_process_landmark(landmark_list)
 
         gesture_id, confidence = self.keypoint_classifier(pre_processed_landmark_list)
         
-        if 0 <= gesture_id < len(self.keypoint_classifier_labels):
+        if 0 <= gesture_id < self._n_labels:
             gesture_name = self.keypoint_classifier_labels[gesture_id]
             return gesture_name, confidence
         
         return None, 0.0
 
+    def _recognize_gestures(self, multi_hand_landmarks):
+        if not self._n_labels:
+            return [(None, 0.0)] * len(multi_hand_landmarks)
+        if len(multi_hand_landmarks) == 1:
+            return [self._recognize_gesture(multi_hand_landmarks[0])]
+
+        # 同一帧中的多只手合并为一个批次，只调用一次分类器
+        batch = np.stack([
+            pre_process_landmark(calc_landmark_list(self.image_width, self.image_height, hand_landmarks))
+            for hand_landmarks in multi_hand_landmarks
+        ])
+
+        gesture_ids, confidences = self.keypoint_classifier.batch_call(batch)
+
+        results = []
+        for gesture_id, confidence in zip(gesture_ids, confidences):
+            if 0 <= gesture_id < self._n_labels:
+                results.append((self.keypoint_classifier_labels[gesture_id], confidence))
+            else:
+                results.append((None, 0.0))
+        return results
+
+    def process_hands(self, rgb):
+        """在共享的 Hands 实例上处理一帧 RGB 图像（加锁串行）"""
+        with self._hands_lock:
+            return self.hands.process(rgb)
+
     # ---------- 外部接口 ----------
     def run(self):
-        if not self.cap.isOpened():
+        if not self.cam.is_opened:
             raise RuntimeError("摄像头无法打开")
 
         last_gesture = None  # 上一次输出的手势
         last_conf = 0.0      # 上一次的置信度（可选判断，避免频繁抖动）
 
-        try:
-            while True:
-                ok, frame = self.cap.read()
-                if not ok:
-                    time.sleep(0.01)
-                    continue
-
-                # 检查分辨率是否变动
-                current_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                current_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                if self.image_width != current_width or self.image_height != current_height:
-                    self.image_width = current_width
-                    self.image_height = current_height
-
-                frame = cv2.flip(frame, 1)
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                rgb.flags.writeable = False
-                res = self.hands.process(rgb)
-                rgb.flags.writeable = True
-
-                if res.multi_hand_landmarks:
-                    for hlm in res.multi_hand_landmarks: 
-                        gesture, conf = self._recognize_gesture(hlm)
-
-                        # 只在手势发生变化时输出
-                        if gesture and gesture != last_gesture:
-                            last_gesture = gesture
-                            last_conf = conf
-                            yield {
-                                "type": "gesture",
-                                "gesture": gesture,
-                                "conf": float(conf),
-                                "ts": time.time(),
-                            }
-
-        finally:
-            self.cap.release()
-            self.hands.close()
+        # 摄像头由 CameraManager 统一释放，Hands 实例在进程内共享，均不在此关闭
+        while True:
+            ok, frame = self.cam.read_frame()
+            if not ok:
+                time.sleep(0.01)
+                continue
+
+            # 检查分辨率是否变动（直接取帧尺寸，无需查询摄像头属性）
+            current_height, current_width = frame.shape[:2]
+            if self.image_width != current_width or self.image_height != current_height:
+                self.image_width = current_width
+                self.image_height = current_height
+
+            if self._rgb_buf is None or self._rgb_buf.shape != frame.shape:
+                self._rgb_buf = np.empty_like(frame)
+            # 先转换到复用缓冲再原地镜像，不修改摄像头共享的帧
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+            cv2.flip(rgb, 1, dst=rgb)
+            rgb.flags.writeable = False
+            res = self.process_hands(rgb)
+            rgb.flags.writeable = True
+
+            if res.multi_hand_landmarks:
+                for gesture, conf in self._recognize_gestures(res.multi_hand_landmarks):
+
+                    # 只在手势发生变化时输出
+                    if gesture and gesture != last_gesture:
+                        last_gesture = gesture
+                        last_conf = conf
+                        yield {
+                            "type": "gesture",
+                            "gesture": gesture,
+                            "conf": float(conf),
+                            "ts": time.time(),
+                        }
+
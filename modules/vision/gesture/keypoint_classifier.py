@@ -8,36 +8,93 @@ class KeyPointClassifier(object):
     def __init__(
         self,
         model_path='models/avazahedi/keypoint_classifier.tflite', # Adjusted default path
-        num_threads=1,
+        num_threads=None,
     ):
         # Ensure model_path is relative to this file's directory if not absolute
         if not os.path.isabs(model_path):
             script_dir = os.path.dirname(__file__)
             model_path = os.path.join(script_dir, model_path)
 
-        self.interpreter = tf.lite.Interpreter(model_path=model_path,
-                                               num_threads=num_threads)
+        # 默认使用一半的 CPU 核心（至少 2 个线程）
+        if num_threads is None:
+            num_threads = max(2, (os.cpu_count() or 2) // 2)
+
+        # 默认的 AUTO 解析器已对浮点模型应用 XNNPACK 委托
+        self.interpreter = tf.lite.Interpreter(
+            model_path=model_path,
+            num_threads=num_threads)
 
         self.interpreter.allocate_tensors()
         self.input_details = self.interpreter.get_input_details()
         self.output_details = self.interpreter.get_output_details()
 
+        # 输入/输出张量索引只查询一次
+        self._in_idx = self.input_details[0]['index']
+        self._out_idx = self.output_details[0]['index']
+
+        # INT8 量化模型的输入/输出量化参数（浮点模型的 scale 为 0，不做转换）
+        self._in_dtype = self.input_details[0]['dtype']
+        self._in_scale, self._in_zero_point = self.input_details[0]['quantization']
+        self._out_scale, self._out_zero_point = self.output_details[0]['quantization']
+
+        # 单样本输入复用同一块缓冲，避免每次调用重新构造数组
+        self._input_dim = int(self.input_details[0]['shape'][-1])
+        self._scratch = np.empty((1, self._input_dim), dtype=self._in_dtype)
+        self._batch_size = int(self.input_details[0]['shape'][0])
+
+    def _quantize(self, values):
+        # 浮点特征按输入量化参数映射到整数区间
+        if not self._in_scale:
+            return values
+        info = np.iinfo(self._in_dtype)
+        quantized = np.round(np.asarray(values, dtype=np.float32) / self._in_scale + self._in_zero_point)
+        return np.clip(quantized, info.min, info.max)
+
+    def _dequantize(self, result):
+        # 整数输出还原为浮点置信度
+        if not self._out_scale:
+            return result
+        return (result.astype(np.float32) - self._out_zero_point) * self._out_scale
+
+    def _resize_input(self, batch_size):
+        # 仅在批大小变化时调整输入张量并重新分配
+        if batch_size != self._batch_size:
+            self.interpreter.resize_tensor_input(
+                self._in_idx, [batch_size, self._input_dim])
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
+
     def __call__(
         self,
         landmark_list,
     ):
-        input_details_tensor_index = self.input_details[0]['index']
-        self.interpreter.set_tensor(
-            input_details_tensor_index,
-            np.array([landmark_list], dtype=np.float32))
+        self._resize_input(1)
+        np.copyto(self._scratch[0], self._quantize(landmark_list), casting='unsafe')
+        self.interpreter.set_tensor(self._in_idx, self._scratch)
         self.interpreter.invoke()
 
-        output_details_tensor_index = self.output_details[0]['index']
-
-        result = self.interpreter.get_tensor(output_details_tensor_index)
+        result = self._dequantize(self.interpreter.get_tensor(self._out_idx))
         
         result_squeezed = np.squeeze(result)
         result_index = np.argmax(result_squeezed)
         confidence = result_squeezed[result_index]
 
-        return result_index, confidence 
\ No newline at end of file
+        return result_index, confidence
+
+    def batch_call(
+        self,
+        landmarks_batch,
+    ):
+        """Classify an (N, D) batch with a single invoke; returns (indices, confidences)."""
+        batch = np.asarray(landmarks_batch, dtype=np.float32).reshape(-1, self._input_dim)
+        batch = self._quantize(batch).astype(self._in_dtype)
+        self._resize_input(batch.shape[0])
+        self.interpreter.set_tensor(self._in_idx, batch)
+        self.interpreter.invoke()
+
+        result = self._dequantize(self.interpreter.get_tensor(self._out_idx))
+
+        result_index = np.argmax(result, axis=1)
+        confidence = result[np.arange(len(result)), result_index]
+
+        return result_index, confidence
@@ -1,12 +1,34 @@
+import functools
+import math
 import time
 import cv2
 import dlib
 import numpy as np
 from imutils import face_utils
-from scipy.spatial import distance as dist
 import os
 
 
+# solvePnP 使用的 3D 人脸模型点及其对应的 68 点特征索引（每帧复用）
+_MODEL_PTS = np.float32([
+    (0.0,   0.0,   0.0),      # 30: nose tip
+    (0.0,  -330.0, -65.0),    # 8: chin
+    (-225.0, 170.0, -135.0),  # 36: left eye corner
+    (225.0, 170.0, -135.0),   # 45: right eye corner
+    (-150.0, -150.0, -125.0), # 48: left mouth corner
+    (150.0, -150.0, -125.0)   # 54: right mouth corner
+])
+_PNP_INDICES = np.array([30, 8, 36, 45, 48, 54])
+_DIST_COEF = np.zeros((4, 1))
+# 闭式求解的 SQPnP（OpenCV 4.5+），旧版本退回迭代法
+_PNP_FLAGS = getattr(cv2, "SOLVEPNP_SQPNP", cv2.SOLVEPNP_ITERATIVE)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_face_models(predictor_path):
+    """按模型路径缓存 dlib 人脸检测器与 68 点预测器，多个检测器实例不重复加载约 100 MB 的模型"""
+    return dlib.get_frontal_face_detector(), dlib.shape_predictor(predictor_path)
+
+
 class HeadPoseDetector:
     """
     头部姿态检测器（接口不变）：
@@ -16,6 +38,12 @@ class HeadPoseDetector:
             • 其余帧 → None
         - reset() 依旧可重置
     """
+
+    # 人脸检测在缩放到该宽度的灰度图上进行，特征点仍在原分辨率上定位
+    DETECTION_WIDTH = 320
+    # 每隔若干帧重新检测一次人脸，其余帧沿用上次的人脸框
+    DETECTION_INTERVAL = 6
+
     def __init__(self,
                  calib_secs=2,
                  yaw_thresh=10,
@@ -37,7 +65,7 @@ class HeadPoseDetector:
         self.pitch0 = None            # 基准俯仰角
 
         # ----------- 状态缓存（一次性动作检测）-----------
-        self.yaw_dir = None           # 'L' / 'R', 上一次超过阈值的方向
+        self.yaw_dir = 0              # 1 (左) / -1 (右) / 0, 上一次超过阈值的方向
         self.pitch_down_frames = 0    # 连续低头帧计数
 
         # ----------- dlib 初始化 -----------
@@ -46,64 +74,84 @@ class HeadPoseDetector:
         if not os.path.exists(predictor_path):
             raise FileNotFoundError(f"找不到面部特征点预测器: {predictor_path}")
 
-        self.detector = dlib.get_frontal_face_detector()
-        self.predictor = dlib.shape_predictor(predictor_path)
+        self.detector, self.predictor = _load_face_models(predictor_path)
 
         # 眼部特征点索引（眨眼用，虽然目前未使用）
         (self.lS, self.lE) = face_utils.FACIAL_LANDMARKS_IDXS["left_eye"]
         (self.rS, self.rE) = face_utils.FACIAL_LANDMARKS_IDXS["right_eye"]
 
+        # 相机内参矩阵只与分辨率有关，分辨率变化时才重建：(size, camera_mtx)
+        self._camera_mtx = None
+
+        # 上次检测到的人脸框（原分辨率）及帧计数
+        self._last_rect = None
+        self._frame_idx = 0
+
     # ------------------------------------------------------------------ #
     #                              工具函数                               #
     # ------------------------------------------------------------------ #
     @staticmethod
     def eye_aspect_ratio(eye):
         """计算眨眼比例 EAR"""
-        from scipy.spatial import distance as dist
-        A = dist.euclidean(eye[1], eye[5])
-        B = dist.euclidean(eye[2], eye[4])
-        C = dist.euclidean(eye[0], eye[3])
+        # 二维点距离直接用 math.hypot，无需经由 scipy 构造数组
+        A = math.hypot(eye[1][0] - eye[5][0], eye[1][1] - eye[5][1])
+        B = math.hypot(eye[2][0] - eye[4][0], eye[2][1] - eye[4][1])
+        C = math.hypot(eye[0][0] - eye[3][0], eye[0][1] - eye[3][1])
         return (A + B) / (2.0 * C)
 
-    @staticmethod
-    def _solve_pnp(shape, size):
+    def _detect_face(self, gray):
+        """在缩小的灰度图上检测人脸，返回原分辨率下的人脸框或 None"""
+        scale = min(1.0, self.DETECTION_WIDTH / gray.shape[1])
+        small = cv2.resize(gray, (0, 0), fx=scale, fy=scale,
+                           interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        rects = self.detector(small, 0)
+        if not rects:
+            return None
+
+        rect = rects[0]
+        return dlib.rectangle(int(rect.left() / scale), int(rect.top() / scale),
+                              int(rect.right() / scale), int(rect.bottom() / scale))
+
+    def _get_camera_mtx(self, size):
+        """按分辨率获取相机内参矩阵（缓存）"""
+        if self._camera_mtx is None or self._camera_mtx[0] != size:
+            h, w = size
+            focal = w
+            center = (w / 2, h / 2)
+            camera_mtx = np.array([[focal, 0, center[0]],
+                                   [0, focal, center[1]],
+                                   [0, 0, 1]], dtype=np.float32)
+            self._camera_mtx = (size, camera_mtx)
+        return self._camera_mtx[1]
+
+    def _solve_pnp(self, shape, size):
         """使用 solvePnP 得到 (yaw, pitch, roll)，单位：度"""
-        model_pts = np.float32([
-            (0.0,   0.0,   0.0),      # 30: nose tip
-            (0.0,  -330.0, -65.0),    # 8: chin
-            (-225.0, 170.0, -135.0),  # 36: left eye corner
-            (225.0, 170.0, -135.0),   # 45: right eye corner
-            (-150.0, -150.0, -125.0), # 48: left mouth corner
-            (150.0, -150.0, -125.0)   # 54: right mouth corner
-        ])
-        image_pts = np.float32([shape[i] for i in (30, 8, 36, 45, 48, 54)])
-
-        h, w = size
-        focal = w
-        center = (w / 2, h / 2)
-        camera_mtx = np.array([[focal, 0, center[0]],
-                               [0, focal, center[1]],
-                               [0, 0, 1]], dtype=np.float32)
-        dist_coef = np.zeros((4, 1))
-
-        ok, rvec, tvec = cv2.solvePnP(model_pts, image_pts,
-                                      camera_mtx, dist_coef,
-                                      flags=cv2.SOLVEPNP_ITERATIVE)
+        image_pts = shape[_PNP_INDICES].astype(np.float32)
+
+        ok, rvec, tvec = cv2.solvePnP(_MODEL_PTS, image_pts,
+                                      self._get_camera_mtx(size), _DIST_COEF,
+                                      flags=_PNP_FLAGS)
         if not ok:
             return None
         rot_mat, _ = cv2.Rodrigues(rvec)
-        pose_mat = cv2.hconcat((rot_mat, tvec))
-        _, _, _, _, _, _, euler = cv2.decomposeProjectionMatrix(pose_mat)
-        pitch, yaw, roll = [x[0] for x in euler]
+        # 直接由旋转矩阵求欧拉角（R = Rz·Ry·Rx），与 decomposeProjectionMatrix 的结果一致
+        pitch = math.degrees(math.atan2(rot_mat[2, 1], rot_mat[2, 2]))
+        yaw = math.degrees(math.atan2(-rot_mat[2, 0], math.hypot(rot_mat[2, 1], rot_mat[2, 2])))
+        roll = math.degrees(math.atan2(rot_mat[1, 0], rot_mat[0, 0]))
         return yaw, pitch, roll
 
     # ------------------------------------------------------------------ #
     #                         核心接口：process_frame                      #
     # ------------------------------------------------------------------ #
-    def process_frame(self, frame):
+    def process_frame(self, frame, gray=None):
         """
         兼容旧接口——一次性动作判定，不做累计计数。
 
+        Parameters
+        ----------
+        frame : BGR 图像帧
+        gray : 可选，同一帧的灰度图；已有时直接复用，不再重复转换
+
         Returns
         -------
         dict | None
@@ -111,12 +159,15 @@ class HeadPoseDetector:
             - 检测到动作时：{'type':'head_pose', 'action':'点头'/'摇头', 'ts':...}
             - 其余情况：None
         """
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        rects = self.detector(gray, 0)
-        if not rects:
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self._last_rect is None or self._frame_idx % self.DETECTION_INTERVAL == 0:
+            self._last_rect = self._detect_face(gray)
+        self._frame_idx += 1
+        if self._last_rect is None:
             return None
 
-        shape = face_utils.shape_to_np(self.predictor(gray, rects[0]))
+        shape = face_utils.shape_to_np(self.predictor(gray, self._last_rect))
         pose = self._solve_pnp(shape, frame.shape[:2])
         if pose is None:
             return None
@@ -140,15 +191,16 @@ class HeadPoseDetector:
         detected_action = None
 
         # ---------------- ② 摇头检测 ----------------
-        if abs(yaw) > self.YAW_THRESH:
-            cur_dir = 'L' if yaw > 0 else 'R'
-            if self.yaw_dir and cur_dir != self.yaw_dir:
+        # 方向用整数 ±1 表示，乘积为负即方向反转
+        cur_dir = 1 if yaw > 0 else -1
+        if yaw * cur_dir > self.YAW_THRESH:
+            if self.yaw_dir * cur_dir < 0:
                 detected_action = "摇头"
-                self.yaw_dir = None  # 复位
+                self.yaw_dir = 0  # 复位
             else:
                 self.yaw_dir = cur_dir
         else:
-            self.yaw_dir = None  # 回到阈值内即清空方向
+            self.yaw_dir = 0  # 回到阈值内即清空方向
 
         # ---------------- ③ 点头检测 ----------------
         if not detected_action:  # 若本帧已判定摇头则优先输出摇头
@@ -177,5 +229,7 @@ class HeadPoseDetector:
         self.sample_cnt = 0
         self.calibrated = False
         self.pitch0 = None
-        self.yaw_dir = None
+        self.yaw_dir = 0
         self.pitch_down_frames = 0
+        self._last_rect = None
+        self._frame_idx = 0
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""交互日志记录器后台写入队列测试"""
+
+import sqlite3
+from decimal import Decimal
+
+from modules.system.interaction_logger import InteractionLogger
+
+
+class SmallQueueLogger(InteractionLogger):
+    WRITE_QUEUE_SIZE = 20
+
+
+def _count(db_path: str, where: str) -> int:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM interaction_logs_all WHERE {where}").fetchone()[0]
+
+
+def test_full_queue_never_drops_failed_interactions(tmp_path):
+    logger = SmallQueueLogger(str(tmp_path))
+
+    # 占住写入锁使后台线程停在写库前，队列只进不出
+    with logger.lock:
+        for i in range(30):
+            logger.log_interaction("command", "voice", {"i": i})
+        for i in range(50):
+            logger.log_interaction("command", "voice", {"i": i}, success=False, error_message="failed")
+        for i in range(30):
+            logger.log_interaction("command", "voice", {"i": i})
+
+    assert logger.flush()
+    assert _count(logger.db_path, "success = 0") == 50
+    assert logger.get_writer_stats()["dropped"] > 0
+
+
+def test_unbindable_row_does_not_discard_rest_of_batch(tmp_path):
+    logger = InteractionLogger(str(tmp_path))
+
+    # 同一批中混入一条 sqlite3 无法绑定的记录（Decimal）
+    with logger.lock:
+        for i in range(10):
+            value = Decimal("0.5") if i == 3 else 0.5
+            logger.log_interaction("command", "voice", {"i": i}, processing_time=value,
+                                   metrics={"voice_processing_time": value})
+
+    assert logger.flush()
+    assert _count(logger.db_path, "1") == 9
+    with sqlite3.connect(logger.db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM performance_stats").fetchone()[0] == 9